@@ -204,6 +204,28 @@ logs_dir = BASE_DIR / 'logs'
 if not os.path.exists(logs_dir):
     os.makedirs(logs_dir)
 
+# Cache: per-process memory by default; set REDIS_URL to share it between worker
+# processes (game snapshots, game_id lookups and sessions live here). SSE wake-ups
+# (game/events.py) stay in-process either way: a stream only wakes at once for
+# writes made by its own worker and sees other workers' writes on its next poll
+REDIS_URL = os.environ.get("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Sessions are read through the cache and written through to the database
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
 # Session security settings
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
@@ -0,0 +1,75 @@
+"""
+Cache-aside reads of Game rows.
+
+Snapshots are keyed on a per-game version token that Game.notify_changed()
+replaces after every committed write, so once a write is visible no reader is
+handed the snapshot from before it. Writers that need a row lock keep reading
+from the database.
+"""
+import threading
+import uuid
+import weakref
+from django.core.cache import cache
+
+GAME_CACHE_SECONDS = 300
+
+
+class _Flight:
+    """Lock shared by the threads loading the same snapshot."""
+    def __init__(self):
+        self.lock = threading.Lock()
+
+
+_flights = weakref.WeakValueDictionary()
+_flights_guard = threading.Lock()
+
+
+def _flight(key):
+    with _flights_guard:
+        flight = _flights.get(key)
+        if flight is None:
+            flight = _flights[key] = _Flight()
+        return flight
+
+
+def _version_key(pk):
+    return f'game:{pk}:ver'
+
+
+def _current_version(pk):
+    version = cache.get(_version_key(pk))
+    if version is None:
+        cache.add(_version_key(pk), uuid.uuid4().hex, None)
+        version = cache.get(_version_key(pk))
+    return version
+
+
+def invalidate_game(pk):
+    """Retire every cached snapshot of a game by giving it a new version token."""
+    cache.set(_version_key(pk), uuid.uuid4().hex, None)
+
+
+def get_cached_game(game_id):
+    """
+    Game for a public game_id, from the cache when possible.
+    
+    Raises:
+        Game.DoesNotExist: If there is no such game
+    """
+    from .models import Game, get_game_pk  # models imports invalidate_game from here
+    
+    pk = get_game_pk(game_id)
+    if pk is None:
+        raise Game.DoesNotExist(f"No game with game_id {game_id!r}")
+    key = f'game:{pk}:v{_current_version(pk)}'
+    game = cache.get(key)
+    if game is None or game.game_id != game_id:
+        # Singleflight: concurrent misses (e.g. every stream woken by one move)
+        # wait for a single database read instead of each issuing their own
+        flight = _flight(key)  # Keep a reference so the entry lives while we hold its lock
+        with flight.lock:
+            game = cache.get(key)
+            if game is None or game.game_id != game_id:
+                game = Game.objects.slim().get(pk=pk, game_id=game_id)
+                cache.set(key, game, GAME_CACHE_SECONDS)
+    return game
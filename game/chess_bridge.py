@@ -1,177 +1,125 @@
 """
-Python-JavaScript bridge for chess.js integration.
-This module handles communication between Django and chess.js for move validation.
+Chess validation bridge.
+Move validation and game status are served in-process by python-chess (see
+chess_engine); the hand-rolled helpers below only cover basic piece movement
+and are used when python-chess is not installed.
 """
-import json
-import subprocess
-import tempfile
-import shutil
 import logging
-import os
-from pathlib import Path
-from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
-# Check if Node.js is available
-HAS_NODE = shutil.which('node') is not None
+try:
+    from .chess_engine import validate_move as _pychess_validate, get_game_status as _pychess_status
+    HAS_PYCHESS = True
+except ImportError:
+    HAS_PYCHESS = False
+    logger.warning("python-chess is not available. Chess move validation will use fallback mode.")
 
-if not HAS_NODE:
-    logger.warning("Node.js is not available. Chess move validation will use fallback mode.")
-    
 # Default FEN position
 STARTING_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
 
-def validate_move(fen, from_square, to_square, promotion=None):
-    """
-    Validate a chess move using chess.js through a Node.js bridge.
-    
-    Args:
-        fen (str): Current position in FEN notation
-        from_square (str): Starting square (e.g., 'e2')
-        to_square (str): Target square (e.g., 'e4')
-        promotion (str, optional): Piece to promote to (e.g., 'q', 'r', 'b', 'n')
-        
-    Returns:
-        dict: Result with keys:
-            - valid (bool): Whether the move is valid
-            - new_fen (str): The new FEN if the move is valid
-            - reason (str): Reason for rejection if invalid
-            - move_info (dict): Additional move information (check, checkmate, etc.)
+# Empty square marker in expanded board buffers
+_EMPTY = ord('.')
+
+# FEN digit -> run of empty squares
+_DIGIT_MAP = str.maketrans({str(n): '.' * n for n in range(1, 9)})
+
+def _square_index(square):
+    """Index of a square (e.g. 'e4') in an expanded board buffer, or None if malformed."""
+    if len(square) != 2 or not ('a' <= square[0] <= 'h') or not ('1' <= square[1] <= '8'):
+        return None
+    return (8 - int(square[1])) * 8 + ord(square[0]) - ord('a')
+
+def _build_move_table(offsets, sliding=False, rows=range(8)):
     """
-    # If Node.js is not available, use a fallback mode for Phase 2 testing
-    if not HAS_NODE:
-        return _fallback_validate_move(fen, from_square, to_square, promotion)
-    
-    # Use relative path since we'll copy chess.js to the temp directory
-    js_code = f"""
-    const {{ Chess }} = require('./chess.js');
-    
-    // Initialize chess instance with given FEN
-    const chess = new Chess('{fen}');
-    
-    let result = {{
-        valid: false,
-        new_fen: chess.fen(),
-        reason: '',
-        move_info: {{
-            check: false,
-            checkmate: false,
-            draw: false,
-            stalemate: false,
-            captured: null,
-            promotion: false
-        }}
-    }};
-    
-    try {{
-        // Try to make the move
-        const move_obj = {{
-            from: '{from_square}',
-            to: '{to_square}'
-            {f", promotion: '{promotion}'" if promotion else ""}
-        }};
-        
-        const move = chess.move(move_obj);
-        
-        if (move) {{
-            result.valid = true;
-            result.new_fen = chess.fen();
-            
-            // Check game state
-            result.move_info.check = chess.in_check();
-            result.move_info.checkmate = chess.in_checkmate();
-            result.move_info.stalemate = chess.in_stalemate();
-            result.move_info.draw = chess.in_draw();
-            
-            // Move information
-            if (move.captured) {{
-                result.move_info.captured = move.captured;
-            }}
-            
-            if (move.promotion) {{
-                result.move_info.promotion = move.promotion;
-            }}
-        }}
-    }} catch (error) {{
-        result.reason = error.message;
-    }}
-    
-    console.log(JSON.stringify(result));
+    Build a 64-entry table of destination bitmasks (bit i = buffer index i)
+    for a piece stepping, or sliding if requested, by the given (row, file) offsets.
+    Squares outside the given rows get an empty mask.
     """
-    
-    # Save the JavaScript to a temporary file
-    js_file_path = None
-    temp_dir = None
-    try:
-        # Create a temporary directory to store both the bridge script and a copy of chess.js
-        temp_dir = tempfile.mkdtemp()
-        
-        # Copy the original chess.js to the temp directory
-        chess_js_orig = str(Path(settings.BASE_DIR) / 'static' / 'js' / 'chess.js')
-        chess_js_temp = os.path.join(temp_dir, 'chess.js')
-        shutil.copy2(chess_js_orig, chess_js_temp)
-        
-        # Create the bridge file in the temp directory
-        js_file_path = os.path.join(temp_dir, 'temp_bridge.js')
-        with open(js_file_path, 'w') as js_file:
-            js_file.write(js_code)
-        
-        # Execute the JavaScript file using Node.js
-        output = subprocess.check_output(
-            ['node', js_file_path], 
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-            cwd=temp_dir
-        )
-        
-        # Parse the JSON output
-        result = json.loads(output.strip())
-        return result
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Error executing Node.js: {e.output}")
-        return {
-            'valid': False,
-            'new_fen': fen,
-            'reason': f"Error running validation: {e.output}",
-            'move_info': {}
-        }
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error: {e}")
-        return {
-            'valid': False,
-            'new_fen': fen,
-            'reason': "Invalid output from validation script",
-            'move_info': {}
-        }
-    except Exception as e:
-        logger.error(f"Unexpected error in validate_move: {e}")
-        return _fallback_validate_move(fen, from_square, to_square, promotion)
-    finally:
-        # Clean up temporary directory and files
-        if temp_dir and os.path.exists(temp_dir):
-            try:
-                shutil.rmtree(temp_dir)
-            except:
-                logger.warning(f"Failed to remove temporary directory: {temp_dir}")
+    table = []
+    for idx in range(64):
+        row, file = divmod(idx, 8)
+        mask = 0
+        if row in rows:
+            for row_step, file_step in offsets:
+                r, f = row + row_step, file + file_step
+                while 0 <= r < 8 and 0 <= f < 8:
+                    mask |= 1 << (r * 8 + f)
+                    if not sliding:
+                        break
+                    r, f = r + row_step, f + file_step
+        table.append(mask)
+    return table
+
+# Precomputed movement patterns; buffer row 0 is rank 8, so white moves towards row 0
+_DIAGONALS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+_STRAIGHTS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+KNIGHT_ATTACKS = _build_move_table([(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)])
+KING_ATTACKS = _build_move_table(_DIAGONALS + _STRAIGHTS)
+BISHOP_RAYS = _build_move_table(_DIAGONALS, sliding=True)
+ROOK_RAYS = _build_move_table(_STRAIGHTS, sliding=True)
+QUEEN_RAYS = [bishop | rook for bishop, rook in zip(BISHOP_RAYS, ROOK_RAYS)]
+
+PIECE_MOVES = {
+    'n': KNIGHT_ATTACKS,
+    'b': BISHOP_RAYS,
+    'r': ROOK_RAYS,
+    'q': QUEEN_RAYS,
+    'k': KING_ATTACKS,
+}
+
+PAWN_PUSHES = {
+    'w': _build_move_table([(-1, 0)]),
+    'b': _build_move_table([(1, 0)]),
+}
+PAWN_DOUBLE_PUSHES = {
+    'w': _build_move_table([(-2, 0)], rows=[6]),
+    'b': _build_move_table([(2, 0)], rows=[1]),
+}
+PAWN_CAPTURES = {
+    'w': _build_move_table([(-1, -1), (-1, 1)]),
+    'b': _build_move_table([(1, -1), (1, 1)]),
+}
+
+def _build_between_table():
+    """BETWEEN[a][b]: bitmask of squares strictly between two aligned squares, else 0."""
+    between = [[0] * 64 for _ in range(64)]
+    for idx in range(64):
+        row, file = divmod(idx, 8)
+        for row_step, file_step in _DIAGONALS + _STRAIGHTS:
+            mask = 0
+            r, f = row + row_step, file + file_step
+            while 0 <= r < 8 and 0 <= f < 8:
+                between[idx][r * 8 + f] = mask
+                mask |= 1 << (r * 8 + f)
+                r, f = r + row_step, f + file_step
+    return between
+
+BETWEEN = _build_between_table()
+
+# Pieces whose path must be clear
+_SLIDING_PIECES = frozenset('brq')
 
 def _fallback_validate_move(fen, from_square, to_square, promotion=None):
     """
-    Fallback move validator for Phase 2 testing when Node.js is not available.
+    Fallback move validator for development when python-chess is not available.
     Implements basic chess move validation.
     
     This is a limited implementation that handles basic piece movement
     but won't properly validate complex rules like check, castling, etc.
     """
-    logger.info(f"Using fallback validation for move {from_square}-{to_square}")
+    logger.info("Using fallback validation for move %s-%s", from_square, to_square)
     
-    # Extract information from the FEN
-    parts = fen.split()
-    position = parts[0]
-    turn = parts[1]
+    # Extract information from the FEN; the castling/en passant/clock tail is kept verbatim
+    position, _, rest = fen.partition(' ')
+    turn, _, tail = rest.partition(' ')
+    
+    # Parse the position once and share the buffer with every helper
+    buf = _expand(position)
     
     # Check if it's the right player's turn
-    piece_at_source = _get_piece_at(position, from_square)
+    piece_at_source = _get_piece_at(position, from_square, buf)
     if not piece_at_source:
         return {
             'valid': False,
@@ -192,7 +140,7 @@ def _fallback_validate_move(fen, from_square, to_square, promotion=None):
         }
     
     # Very basic move validation - prevent capturing own pieces
-    piece_at_target = _get_piece_at(position, to_square)
+    piece_at_target = _get_piece_at(position, to_square, buf)
     if piece_at_target:
         target_color = 'w' if piece_at_target.isupper() else 'b'
         if target_color == piece_color:
@@ -205,7 +153,7 @@ def _fallback_validate_move(fen, from_square, to_square, promotion=None):
     
     # Basic validation for piece movement patterns
     piece_type = piece_at_source.lower()
-    if not _is_valid_move(piece_type, piece_color, from_square, to_square, position):
+    if not _is_valid_move(piece_type, piece_color, from_square, to_square, position, buf):
         return {
             'valid': False,
             'new_fen': fen,
@@ -214,15 +162,11 @@ def _fallback_validate_move(fen, from_square, to_square, promotion=None):
         }
     
     # Create a new FEN with the move applied
-    new_position = _apply_move_to_position(position, from_square, to_square, promotion)
+    new_position = _apply_move_to_position(position, from_square, to_square, promotion, buf)
     
-    # Update turn
+    # Update turn and FEN with new position
     new_turn = 'b' if turn == 'w' else 'w'
-    parts[1] = new_turn
-    
-    # Update FEN with new position
-    parts[0] = new_position
-    new_fen = " ".join(parts)
+    new_fen = f"{new_position} {new_turn} {tail}" if tail else f"{new_position} {new_turn}"
     
     # Determine if a piece was captured
     captured = piece_at_target is not None
@@ -241,237 +185,115 @@ def _fallback_validate_move(fen, from_square, to_square, promotion=None):
         }
     }
 
-def _get_piece_at(position, square):
-    """Get the piece at a square in FEN position."""
-    file_idx = ord(square[0]) - ord('a')
-    rank_idx = 8 - int(square[1])
-    
-    # Split the position into ranks
-    ranks = position.split('/')
-    
-    # Get the rank containing the square
-    if 0 <= rank_idx < len(ranks):
-        rank = ranks[rank_idx]
-    else:
-        return None
-    
-    # Parse the rank to find the piece at the file
-    idx = 0
-    for char in rank:
-        if char.isdigit():
-            idx += int(char)
-        else:
-            if idx == file_idx:
-                return char
-            idx += 1
-    
-    return None
+def _expand(position):
+    """Expand a FEN position into a 64-byte board buffer, rank 8 first."""
+    return bytearray(position.translate(_DIGIT_MAP).replace('/', ''), 'ascii')
+
+def _collapse(buf):
+    """Encode a 64-byte board buffer back into a FEN position string."""
+    ranks = []
+    for rank_start in range(0, 64, 8):
+        empty_count = 0
+        rank_str = ""
+        for cell in buf[rank_start:rank_start + 8]:
+            if cell == _EMPTY:
+                empty_count += 1
+            else:
+                if empty_count > 0:
+                    rank_str += str(empty_count)
+                    empty_count = 0
+                rank_str += chr(cell)
+        if empty_count > 0:
+            rank_str += str(empty_count)
+        ranks.append(rank_str)
+    return '/'.join(ranks)
+
+def _occupancy(buf):
+    """Bitmask of occupied squares (bit i set iff buffer index i holds a piece)."""
+    occ = 0
+    for idx, cell in enumerate(buf):
+        if cell != _EMPTY:
+            occ |= 1 << idx
+    return occ
 
-def _get_piece_color_at(position, square):
-    """Helper function to get piece color at a square in FEN position."""
-    piece = _get_piece_at(position, square)
-    if not piece:
+def _get_piece_at(position, square, board_buf=None):
+    """Get the piece at a square in FEN position (or its pre-expanded board_buf)."""
+    idx = _square_index(square)
+    if idx is None:
         return None
-    return 'w' if piece.isupper() else 'b'
+    
+    if board_buf is None:
+        board_buf = _expand(position)
+    cell = board_buf[idx]
+    return None if cell == _EMPTY else chr(cell)
 
-def _is_valid_move(piece_type, piece_color, from_square, to_square, position):
+def _is_valid_move(piece_type, piece_color, from_square, to_square, position, board_buf=None):
     """
     Basic validation for piece movement patterns.
     This is a simplified version that doesn't check for all chess rules.
     """
-    # Convert squares to coordinates
-    from_file, from_rank = ord(from_square[0]) - ord('a'), int(from_square[1])
-    to_file, to_rank = ord(to_square[0]) - ord('a'), int(to_square[1])
+    if board_buf is None:
+        board_buf = _expand(position)
     
-    # Calculate the difference
-    file_diff = abs(to_file - from_file)
-    rank_diff = abs(to_rank - from_rank)
+    from_idx = _square_index(from_square)
+    to_idx = _square_index(to_square)
+    if from_idx is None or to_idx is None:
+        return False
+    to_bb = 1 << to_idx
     
-    # For the fallback validator, we'll implement simplified rules
-    # Pawns move 1 square forward (2 from starting position)
+    # Pawns move 1 square forward (2 from starting position) and capture diagonally
     if piece_type == 'p':
-        # White pawns move up, black pawns move down
-        direction = 1 if piece_color == 'w' else -1
+        target_empty = board_buf[to_idx] == _EMPTY
+        
+        if PAWN_PUSHES[piece_color][from_idx] & to_bb:
+            return target_empty
         
-        # Moving straight ahead (no capture)
-        if file_diff == 0:
-            # Check if there's a piece in the destination square
-            if _get_piece_at(position, to_square):
-                return False
-                
-            # Normal move: 1 square forward
-            if to_rank - from_rank == direction:
-                return True
-                
-            # Starting move: 2 squares forward
-            if ((piece_color == 'w' and from_rank == 2 and to_rank == 4) or 
-                (piece_color == 'b' and from_rank == 7 and to_rank == 5)):
-                # Check if path is clear
-                mid_rank = from_rank + direction
-                mid_square = chr(from_file + ord('a')) + str(mid_rank)
-                if not _get_piece_at(position, mid_square):
-                    return True
+        if PAWN_DOUBLE_PUSHES[piece_color][from_idx] & to_bb:
+            # Check if path is clear
+            return target_empty and not (_occupancy(board_buf) & BETWEEN[from_idx][to_idx])
         
-        # Capture: 1 square diagonally
-        elif file_diff == 1 and to_rank - from_rank == direction:
+        if PAWN_CAPTURES[piece_color][from_idx] & to_bb:
             # Check if there's an opponent's piece
-            target_piece = _get_piece_at(position, to_square)
-            return target_piece is not None
-            
+            return not target_empty
+        
         return False
     
-    # Simple implementation for other pieces
-    # Knight: L-shaped movement
-    elif piece_type == 'n':
-        return (file_diff == 1 and rank_diff == 2) or (file_diff == 2 and rank_diff == 1)
-    
-    # Bishop: diagonal movement
-    elif piece_type == 'b':
-        return file_diff == rank_diff
-    
-    # Rook: straight movement
-    elif piece_type == 'r':
-        return file_diff == 0 or rank_diff == 0
-    
-    # Queen: combines bishop and rook
-    elif piece_type == 'q':
-        return file_diff == rank_diff or file_diff == 0 or rank_diff == 0
-    
-    # King: 1 square in any direction
-    elif piece_type == 'k':
-        return file_diff <= 1 and rank_diff <= 1
-    
-    return False
+    # Other pieces: movement pattern, plus a clear path for sliding pieces
+    table = PIECE_MOVES.get(piece_type)
+    if table is None or not table[from_idx] & to_bb:
+        return False
+    if piece_type in _SLIDING_PIECES:
+        return not (_occupancy(board_buf) & BETWEEN[from_idx][to_idx])
+    return True
 
-def _apply_move_to_position(position, from_square, to_square, promotion=None):
+def _apply_move_to_position(position, from_square, to_square, promotion=None, board_buf=None):
     """
     Apply a move to the position and return the new position string.
     This is a simplified version that doesn't handle all chess rules.
+    A pre-expanded board_buf is mutated in place.
     """
-    # Convert position to a 2D array for easier manipulation
-    board = []
-    for rank in position.split('/'):
-        row = []
-        for char in rank:
-            if char.isdigit():
-                row.extend(['.'] * int(char))
-            else:
-                row.append(char)
-        board.append(row)
+    buf = board_buf if board_buf is not None else _expand(position)
     
     # Get coordinates
-    from_file, from_rank = ord(from_square[0]) - ord('a'), 8 - int(from_square[1])
-    to_file, to_rank = ord(to_square[0]) - ord('a'), 8 - int(to_square[1])
-    
-    # Get the piece
-    piece = board[from_rank][from_file]
+    from_idx = (8 - int(from_square[1])) * 8 + ord(from_square[0]) - ord('a')
+    to_idx = (8 - int(to_square[1])) * 8 + ord(to_square[0]) - ord('a')
     
     # Move the piece
-    board[from_rank][from_file] = '.'
+    piece = chr(buf[from_idx])
+    buf[from_idx] = _EMPTY
     
     # Handle promotion
-    if promotion and piece.lower() == 'p' and (to_rank == 0 or to_rank == 7):
+    if promotion and piece.lower() == 'p' and to_idx // 8 in (0, 7):
         promotion_piece = promotion.upper() if piece.isupper() else promotion.lower()
-        board[to_rank][to_file] = promotion_piece
+        buf[to_idx] = ord(promotion_piece)
     else:
-        board[to_rank][to_file] = piece
-    
-    # Convert board back to FEN position string
-    new_position = []
-    for row in board:
-        empty_count = 0
-        rank_str = ""
-        for cell in row:
-            if cell == '.':
-                empty_count += 1
-            else:
-                if empty_count > 0:
-                    rank_str += str(empty_count)
-                    empty_count = 0
-                rank_str += cell
-        if empty_count > 0:
-            rank_str += str(empty_count)
-        new_position.append(rank_str)
-    
-    return '/'.join(new_position)
-
-def get_game_status(fen):
-    """
-    Get the current game status from a FEN string.
-    
-    Args:
-        fen (str): Current position in FEN notation
-        
-    Returns:
-        dict: Game status information
-    """
-    # If Node.js is not available, use a fallback
-    if not HAS_NODE:
-        return _fallback_get_game_status(fen)
-    
-    # Use relative path since we'll copy chess.js to the temp directory
-    js_code = f"""
-    const {{ Chess }} = require('./chess.js');
-    
-    // Initialize chess instance with given FEN
-    const chess = new Chess('{fen}');
-    
-    let result = {{
-        in_check: chess.in_check(),
-        in_checkmate: chess.in_checkmate(),
-        in_stalemate: chess.in_stalemate(),
-        in_draw: chess.in_draw(),
-        insufficient_material: chess.insufficient_material(),
-        in_threefold_repetition: chess.in_threefold_repetition(),
-        game_over: chess.game_over(),
-        turn: chess.turn()
-    }};
-    
-    console.log(JSON.stringify(result));
-    """
+        buf[to_idx] = ord(piece)
     
-    # Save the JavaScript to a temporary file
-    js_file_path = None
-    temp_dir = None
-    try:
-        # Create a temporary directory to store both the bridge script and a copy of chess.js
-        temp_dir = tempfile.mkdtemp()
-        
-        # Copy the original chess.js to the temp directory
-        chess_js_orig = str(Path(settings.BASE_DIR) / 'static' / 'js' / 'chess.js')
-        chess_js_temp = os.path.join(temp_dir, 'chess.js')
-        shutil.copy2(chess_js_orig, chess_js_temp)
-        
-        # Create the bridge file in the temp directory
-        js_file_path = os.path.join(temp_dir, 'temp_bridge.js')
-        with open(js_file_path, 'w') as js_file:
-            js_file.write(js_code)
-        
-        # Execute the JavaScript file using Node.js
-        output = subprocess.check_output(
-            ['node', js_file_path], 
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-            cwd=temp_dir
-        )
-        
-        # Parse the JSON output
-        result = json.loads(output.strip())
-        return result
-    except Exception as e:
-        logger.error(f"Error in get_game_status: {str(e)}")
-        return _fallback_get_game_status(fen)
-    finally:
-        # Clean up temporary directory and files
-        if temp_dir and os.path.exists(temp_dir):
-            try:
-                shutil.rmtree(temp_dir)
-            except:
-                logger.warning(f"Failed to remove temporary directory: {temp_dir}")
+    return _collapse(buf)
 
 def _fallback_get_game_status(fen):
-    """Fallback game status checker for when Node.js is not available."""
-    logger.info(f"Using fallback game status check for FEN: {fen}")
+    """Fallback game status checker for when python-chess is not available."""
+    logger.info("Using fallback game status check for FEN: %s", fen)
     
     # Extract turn from FEN
     parts = fen.split()
@@ -487,4 +309,12 @@ def _fallback_get_game_status(fen):
         'in_threefold_repetition': False,
         'game_over': False,
         'turn': turn
-    }
\ No newline at end of file
+    }
+
+# Prefer python-chess; the hand-rolled validator is a development-only fallback
+if HAS_PYCHESS:
+    validate_move = _pychess_validate
+    get_game_status = _pychess_status
+else:
+    validate_move = _fallback_validate_move
+    get_game_status = _fallback_get_game_status
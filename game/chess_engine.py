@@ -3,12 +3,140 @@ Secure Python chess engine using python-chess library.
 Replaces the insecure Node.js subprocess approach.
 """
 import chess
-import chess.engine
 import logging
-from typing import Dict, Any, Optional
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Promotion piece notation
+PROMOTION_PIECES = {
+    'q': chess.QUEEN,
+    'r': chess.ROOK,
+    'b': chess.BISHOP,
+    'n': chess.KNIGHT
+}
+
+# Syntactic FEN check; python-chess still validates the position itself
+FEN_RE = re.compile(r'([rnbqkpRNBQKP1-8]+/){7}[rnbqkpRNBQKP1-8]+ [wb] (-|[KQkq]{1,4}) (-|[a-h][36]) \d+ \d+')
+
+# FEN placement expansion: digits become runs of empty-square dots
+_EXPAND_DIGITS = str.maketrans({str(n): '.' * n for n in range(1, 9)})
+_EMPTY_RUN = re.compile(r'\.+')
+
+# Algebraic square names, 'a1' to 'h8'
+_SQUARE_NAMES = frozenset(chess.SQUARE_NAMES)
+
+# Squares whose pieces carry castling rights
+_CASTLING_SQUARES = frozenset([chess.A1, chess.E1, chess.H1, chess.A8, chess.E8, chess.H8])
+
+def _incremental_fen(prev_fen: str, move: chess.Move, board_after: chess.Board,
+                     piece: chess.Piece, is_capture: bool) -> str:
+    """
+    Derive the FEN after a plain move by patching the previous FEN instead of
+    re-serializing the whole board. Falls back to board_after.fen() when the
+    castling rights or en passant square may have changed.
+    """
+    fields = prev_fen.split()
+    if len(fields) != 6 or board_after.ep_square is not None:
+        return board_after.fen()
+    placement, turn, castling, _, halfmove, fullmove = fields
+    if castling != '-' and (move.from_square in _CASTLING_SQUARES or move.to_square in _CASTLING_SQUARES):
+        return board_after.fen()
+    
+    # Squares are indexed rank 8 first, as in the FEN placement field
+    cells = list(placement.translate(_EXPAND_DIGITS).replace('/', ''))
+    cells[(7 - chess.square_rank(move.from_square)) * 8 + chess.square_file(move.from_square)] = '.'
+    symbol = chess.Piece(move.promotion, piece.color).symbol() if move.promotion else piece.symbol()
+    cells[(7 - chess.square_rank(move.to_square)) * 8 + chess.square_file(move.to_square)] = symbol
+    expanded = ''.join(cells)
+    placement = _EMPTY_RUN.sub(lambda run: str(len(run.group())),
+                               '/'.join(expanded[i:i + 8] for i in range(0, 64, 8)))
+    
+    halfmove = 0 if is_capture or piece.piece_type == chess.PAWN else int(halfmove) + 1
+    if turn == 'b':
+        fullmove = int(fullmove) + 1
+    return f"{placement} {'b' if turn == 'w' else 'w'} {castling} - {halfmove} {fullmove}"
+
+@lru_cache(maxsize=4096)
+def _apply_uci(fen: str, uci: str) -> Optional[Tuple[str, bool, bool, bool, bool, Optional[str], bool]]:
+    """
+    Push a UCI move onto the position if it is legal.
+    Positions are immutable, so cached results are never invalidated.
+    Raises chess.InvalidMoveError for malformed UCI.
+    
+    Returns:
+        tuple: (new_fen, check, checkmate, stalemate, draw, captured, promotion),
+        or None if the move is illegal
+    """
+    board = chess.Board(fen)
+    
+    try:
+        move = board.parse_uci(uci)
+    except chess.IllegalMoveError:
+        # A pawn reaching the last rank without a promotion piece promotes to a queen
+        move = chess.Move.from_uci(uci)
+        if (move.promotion is not None
+                or board.piece_type_at(move.from_square) != chess.PAWN
+                or chess.square_rank(move.to_square) not in (0, 7)):
+            return None
+        try:
+            move = board.parse_uci(uci + 'q')
+        except chess.IllegalMoveError:
+            return None
+    
+    # parse_uci accepts the null move '0000'
+    if not move:
+        return None
+    
+    # Get piece being captured (before making the move)
+    captured_piece = board.piece_at(move.to_square)
+    captured = captured_piece.symbol().lower() if captured_piece else None
+    
+    # Castling and en passant touch more than two squares
+    plain_move = not (board.is_castling(move) or board.is_en_passant(move))
+    piece = board.piece_at(move.from_square)
+    
+    board.push(move)
+    if plain_move:
+        new_fen = _incremental_fen(fen, move, board, piece, captured_piece is not None)
+    else:
+        new_fen = board.fen()
+    checkmate = board.is_checkmate()
+    return (
+        new_fen,
+        board.is_check(),
+        checkmate,
+        board.is_stalemate(),
+        board.is_game_over() and not checkmate,
+        captured,
+        move.promotion is not None,
+    )
+
+def _move_input_error(from_square: Any, to_square: Any, promotion: Any) -> Optional[str]:
+    """
+    Reason a move's squares or promotion piece are malformed, or None if they
+    are well-formed. Shared by validate_move and validate_moves.
+    """
+    # Validate promotion piece notation
+    if promotion is not None and not isinstance(promotion, str):
+        return f"Invalid promotion piece: {promotion!r}"
+    promotion = (promotion or '').lower()
+    if promotion and promotion not in PROMOTION_PIECES:
+        return f"Invalid promotion piece: {promotion}"
+    
+    # Checked here rather than left to python-chess, whose parse errors differ
+    # between the UCI parser and parse_square
+    if not isinstance(from_square, str) or not isinstance(to_square, str) \
+            or from_square not in _SQUARE_NAMES or to_square not in _SQUARE_NAMES:
+        return f"Invalid square notation: expected squares like 'e2', got {from_square!r} and {to_square!r}"
+    if from_square == to_square:
+        return f"Invalid square notation: from and to are both {from_square!r}"
+    return None
+
 def validate_move(fen: str, from_square: str, to_square: str, promotion: Optional[str] = None) -> Dict[str, Any]:
     """
     Validate a chess move using python-chess library.
@@ -26,44 +154,29 @@ def validate_move(fen: str, from_square: str, to_square: str, promotion: Optiona
             - reason (str): Reason for rejection if invalid
             - move_info (dict): Additional move information
     """
+    # Reject malformed input before python-chess parses it
+    if not isinstance(fen, str) or not FEN_RE.fullmatch(fen):
+        return {
+            'valid': False,
+            'new_fen': fen,
+            'reason': "Invalid FEN",
+            'move_info': {}
+        }
+    
+    error = _move_input_error(from_square, to_square, promotion)
+    if error:
+        return {
+            'valid': False,
+            'new_fen': fen,
+            'reason': error,
+            'move_info': {}
+        }
+    
     try:
-        # Create board from FEN
-        board = chess.Board(fen)
-        
-        # Parse squares
-        try:
-            from_sq = chess.parse_square(from_square)
-            to_sq = chess.parse_square(to_square)
-        except ValueError as e:
-            return {
-                'valid': False,
-                'new_fen': fen,
-                'reason': f"Invalid square notation: {str(e)}",
-                'move_info': {}
-            }
-        
-        # Create move object
-        if promotion:
-            # Map promotion piece notation
-            promotion_map = {
-                'q': chess.QUEEN,
-                'r': chess.ROOK,
-                'b': chess.BISHOP,
-                'n': chess.KNIGHT
-            }
-            if promotion.lower() not in promotion_map:
-                return {
-                    'valid': False,
-                    'new_fen': fen,
-                    'reason': f"Invalid promotion piece: {promotion}",
-                    'move_info': {}
-                }
-            move = chess.Move(from_sq, to_sq, promotion=promotion_map[promotion.lower()])
-        else:
-            move = chess.Move(from_sq, to_sq)
-        
         # Check if move is legal
-        if move not in board.legal_moves:
+        promotion = (promotion or '').lower()
+        result = _apply_uci(fen, f"{from_square}{to_square}{promotion}")
+        if result is None:
             return {
                 'valid': False,
                 'new_fen': fen,
@@ -71,24 +184,16 @@ def validate_move(fen: str, from_square: str, to_square: str, promotion: Optiona
                 'move_info': {}
             }
         
-        # Get piece being captured (before making the move)
-        captured_piece = board.piece_at(to_sq)
-        captured = captured_piece.symbol().lower() if captured_piece else None
-        
-        # Make the move
-        board.push(move)
-        
-        # Get new FEN
-        new_fen = board.fen()
+        new_fen, check, checkmate, stalemate, draw, captured, promoted = result
         
         # Collect move information
         move_info = {
-            'check': board.is_check(),
-            'checkmate': board.is_checkmate(),
-            'stalemate': board.is_stalemate(),
-            'draw': board.is_game_over() and not board.is_checkmate(),
+            'check': check,
+            'checkmate': checkmate,
+            'stalemate': stalemate,
+            'draw': draw,
             'captured': captured,
-            'promotion': promotion is not None
+            'promotion': promoted
         }
         
         return {
@@ -98,6 +203,13 @@ def validate_move(fen: str, from_square: str, to_square: str, promotion: Optiona
             'move_info': move_info
         }
         
+    except chess.InvalidMoveError as e:
+        return {
+            'valid': False,
+            'new_fen': fen,
+            'reason': f"Invalid square notation: {str(e)}",
+            'move_info': {}
+        }
     except ValueError as e:
         logger.error(f"Invalid FEN: {fen}, error: {str(e)}")
         return {
@@ -115,29 +227,156 @@ def validate_move(fen: str, from_square: str, to_square: str, promotion: Optiona
             'move_info': {}
         }
 
-def get_game_status(fen: str) -> Dict[str, Any]:
+def validate_moves(fen: str, moves: Iterable[Tuple[str, str, Optional[str]]]) -> List[Dict[str, Any]]:
     """
-    Get the current game status from a FEN string.
+    Validate several candidate moves against the same position.
+    The FEN is parsed and its legal moves generated once for the whole batch.
     
     Args:
         fen: Current position in FEN notation
+        moves: (from_square, to_square, promotion) tuples; promotion may be None
         
     Returns:
-        dict: Game status information
+        list: One result dict per move, in the same format as validate_move
     """
+    def invalid(reason):
+        return {
+            'valid': False,
+            'new_fen': fen,
+            'reason': reason,
+            'move_info': {}
+        }
+    
+    # Reject malformed input before python-chess parses it
+    if not isinstance(fen, str) or not FEN_RE.fullmatch(fen):
+        return [invalid("Invalid FEN") for _ in moves]
+    
     try:
         board = chess.Board(fen)
+    except ValueError as e:
+        logger.error(f"Invalid FEN: {fen}, error: {str(e)}")
+        return [invalid(f"Invalid FEN: {str(e)}") for _ in moves]
+    
+    legal = set(board.legal_moves)
+    results = []
+    
+    for from_square, to_square, promotion in moves:
+        error = _move_input_error(from_square, to_square, promotion)
+        if error:
+            results.append(invalid(error))
+            continue
+        
+        from_sq = chess.parse_square(from_square)
+        to_sq = chess.parse_square(to_square)
+        promotion = (promotion or '').lower()
+        move = chess.Move(from_sq, to_sq, promotion=PROMOTION_PIECES.get(promotion))
+        if move not in legal and not promotion:
+            # A pawn reaching the last rank without a promotion piece promotes to a queen
+            move = chess.Move(from_sq, to_sq, promotion=chess.QUEEN)
+        if move not in legal:
+            results.append(invalid("Illegal move"))
+            continue
+        
+        captured_piece = board.piece_at(to_sq)
+        board.push(move)
+        checkmate = board.is_checkmate()
+        results.append({
+            'valid': True,
+            'new_fen': board.fen(),
+            'reason': "",
+            'move_info': {
+                'check': board.is_check(),
+                'checkmate': checkmate,
+                'stalemate': board.is_stalemate(),
+                'draw': board.is_game_over() and not checkmate,
+                'captured': captured_piece.symbol().lower() if captured_piece else None,
+                'promotion': move.promotion is not None
+            }
+        })
+        board.pop()
+    
+    return results
+
+def _validate_packed(args: Tuple[str, str, str, Optional[str]]) -> Dict[str, Any]:
+    """Process pool entry point for validate_many."""
+    return validate_move(*args)
+
+def validate_many(items: Sequence[Tuple[str, str, str, Optional[str]]],
+                  max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Validate independent (fen, from_square, to_square, promotion) moves across
+    a process pool, for bulk work such as PGN import or opening-tree ingestion.
+    Batches smaller than the worker count are validated in-process.
+    
+    Args:
+        items: (fen, from_square, to_square, promotion) tuples; promotion may be None
+        max_workers: Number of worker processes (defaults to the CPU count)
         
+    Returns:
+        list: One validate_move result dict per item, in input order
+    """
+    workers = max_workers or os.cpu_count() or 1
+    if workers == 1 or len(items) < workers:
+        return [validate_move(*item) for item in items]
+    
+    chunksize = max(1, len(items) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_validate_packed, items, chunksize=chunksize))
+
+@lru_cache(maxsize=8192)
+def _status_for_position(position_key: str) -> Dict[str, Any]:
+    """
+    Game status of a position, keyed by its FEN without the fullmove number
+    (which no status flag depends on) so transpositions share an entry.
+    A board built from a FEN has no move stack, so repetition is always
+    reported as False.
+    """
+    board = chess.Board(position_key)
+    # Generate legal moves once and derive mate/stalemate from it rather than
+    # letting is_checkmate/is_stalemate/is_game_over each regenerate them
+    check = board.is_check()
+    has_moves = any(board.generate_legal_moves())
+    checkmate = check and not has_moves
+    insufficient = board.is_insufficient_material()
+    game_over = not has_moves or insufficient or board.halfmove_clock >= 150
+    
+    return {
+        'in_check': check,
+        'in_checkmate': checkmate,
+        'in_stalemate': not check and not has_moves,
+        'in_draw': game_over and not checkmate,
+        'insufficient_material': insufficient,
+        'in_threefold_repetition': False,
+        'game_over': game_over,
+        'turn': 'w' if board.turn == chess.WHITE else 'b'
+    }
+
+def get_game_status(fen: str) -> Dict[str, Any]:
+    """
+    Get the current game status from a FEN string.
+    
+    Args:
+        fen: Current position in FEN notation
+        
+    Returns:
+        dict: Game status information
+    """
+    # Reject malformed input before python-chess parses it
+    if not isinstance(fen, str) or not FEN_RE.fullmatch(fen):
         return {
-            'in_check': board.is_check(),
-            'in_checkmate': board.is_checkmate(),
-            'in_stalemate': board.is_stalemate(),
-            'in_draw': board.is_game_over() and not board.is_checkmate(),
-            'insufficient_material': board.is_insufficient_material(),
-            'in_threefold_repetition': board.is_repetition(),
-            'game_over': board.is_game_over(),
-            'turn': 'w' if board.turn == chess.WHITE else 'b'
+            'in_check': False,
+            'in_checkmate': False,
+            'in_stalemate': False,
+            'in_draw': False,
+            'insufficient_material': False,
+            'in_threefold_repetition': False,
+            'game_over': False,
+            'turn': 'w'
         }
+    
+    try:
+        # Copy so callers can't mutate the cached entry
+        return dict(_status_for_position(fen.rsplit(' ', 1)[0]))
         
     except ValueError as e:
         logger.error(f"Invalid FEN in get_game_status: {fen}, error: {str(e)}")
@@ -2,10 +2,97 @@
 Utility functions for chess game logic.
 """
 import logging
+import struct
+from functools import lru_cache
 from .chess_engine import validate_move, get_game_status
 
 logger = logging.getLogger(__name__)
 
+STARTING_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+# Binary FEN layout (38 bytes):
+#   32 bytes  one nibble per square in FEN order (a8..h8, ..., a1..h1), 0 = empty
+#    1 byte   bit 0 = black to move, bits 1-4 = castling rights K, Q, k, q
+#    1 byte   en passant file + 1, or 0 for none (rank follows from the side to move)
+#    2 bytes  halfmove clock, 2 bytes fullmove number (big-endian)
+_PIECE_CODES = {piece: code for code, piece in enumerate('PNBRQKpnbrqk', start=1)}
+_CODE_PIECES = '.' + 'PNBRQKpnbrqk'
+_CASTLING_FLAGS = 'KQkq'
+_FEN_TAIL = struct.Struct('>BBHH')
+
+def pack_fen(fen):
+    """
+    Encode a FEN string as 38 bytes.
+    
+    Args:
+        fen (str): Position in FEN notation
+        
+    Returns:
+        bytes: The packed position
+        
+    Raises:
+        ValueError: If the FEN is malformed
+    """
+    try:
+        placement, turn, castling, en_passant, halfmove, fullmove = fen.split()
+        
+        codes = []
+        for char in placement:
+            if char.isdigit():
+                codes.extend([0] * int(char))
+            elif char != '/':
+                codes.append(_PIECE_CODES[char])
+        if len(codes) != 64:
+            raise ValueError(f"expected 64 squares, got {len(codes)}")
+        
+        flags = 1 if turn == 'b' else 0
+        for bit, right in enumerate(_CASTLING_FLAGS, start=1):
+            if right in castling:
+                flags |= 1 << bit
+        ep_file = 0 if en_passant == '-' else ord(en_passant[0]) - ord('a') + 1
+        
+        board = bytes((codes[i] << 4) | codes[i + 1] for i in range(0, 64, 2))
+        return board + _FEN_TAIL.pack(flags, ep_file, int(halfmove), int(fullmove))
+    except (KeyError, ValueError, AttributeError, struct.error) as e:
+        raise ValueError(f"Invalid FEN {fen!r}: {e}") from e
+
+@lru_cache(maxsize=4096)
+def _unpack_fen(data):
+    ranks = []
+    for rank_start in range(0, 32, 4):
+        empty_count = 0
+        rank_str = ""
+        for byte in data[rank_start:rank_start + 4]:
+            for code in (byte >> 4, byte & 0x0F):
+                if code == 0:
+                    empty_count += 1
+                    continue
+                if empty_count:
+                    rank_str += str(empty_count)
+                    empty_count = 0
+                rank_str += _CODE_PIECES[code]
+        if empty_count:
+            rank_str += str(empty_count)
+        ranks.append(rank_str)
+    
+    flags, ep_file, halfmove, fullmove = _FEN_TAIL.unpack_from(data, 32)
+    turn = 'b' if flags & 1 else 'w'
+    castling = ''.join(right for bit, right in enumerate(_CASTLING_FLAGS, start=1) if flags & (1 << bit)) or '-'
+    en_passant = chr(ord('a') + ep_file - 1) + ('3' if turn == 'b' else '6') if ep_file else '-'
+    return f"{'/'.join(ranks)} {turn} {castling} {en_passant} {halfmove} {fullmove}"
+
+def unpack_fen(data):
+    """
+    Decode bytes produced by pack_fen back into a FEN string.
+    
+    Args:
+        data (bytes | memoryview): The packed position
+        
+    Returns:
+        str: Position in FEN notation
+    """
+    return _unpack_fen(bytes(data))
+
 def validate_chess_move(fen, move_data):
     """
     Validate a chess move.
@@ -33,9 +120,9 @@ def validate_chess_move(fen, move_data):
         result = validate_move(fen, from_square, to_square, promotion)
         
         if not result['valid']:
-            logger.info(f"Invalid move {from_square}-{to_square}: {result['reason']}")
+            logger.info("Invalid move %s-%s: %s", from_square, to_square, result['reason'])
         else:
-            logger.info(f"Valid move {from_square}-{to_square} -> {result['new_fen']}")
+            logger.info("Valid move %s-%s -> %s", from_square, to_square, result['new_fen'])
             
         return result
     except Exception as e:
@@ -47,6 +134,19 @@ def validate_chess_move(fen, move_data):
             'move_info': {}
         }
 
+# Statuses of the starting position and the most common first moves, computed once
+# at import so new games never reach the engine (or its LRU cache) for them
+_PRECOMPUTED_STATUS = {
+    fen: get_game_status(fen)
+    for fen in (
+        STARTING_FEN,
+        'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1',
+        'rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq - 0 1',
+        'rnbqkbnr/pppppppp/8/8/2P5/8/PP1PPPPP/RNBQKBNR b KQkq - 0 1',
+        'rnbqkbnr/pppppppp/8/8/8/5N2/PPPPPPPP/RNBQKB1R b KQkq - 1 1',
+    )
+}
+
 def get_chess_game_status(fen):
     """
     Get the current status of a chess game.
@@ -57,6 +157,9 @@ def get_chess_game_status(fen):
     Returns:
         dict: Game status information
     """
+    precomputed = _PRECOMPUTED_STATUS.get(fen)
+    if precomputed is not None:
+        return dict(precomputed)
     try:
         return get_game_status(fen)
     except Exception as e:
@@ -0,0 +1,59 @@
+"""
+In-process game update notifications.
+
+Game writes call publish() with the game's primary key once they have been
+committed (see Game.notify_changed), and SSE streams block on the channel from
+subscribe() instead of re-reading the game row on a timer. Each game watched by
+a stream has its own channel, so a publish only wakes that game's streams; a
+channel is dropped once no stream holds it, and publishing to a game nobody is
+watching does nothing. A channel's version counter is bumped by every publish,
+so a stream only has to remember the last version it saw.
+
+Channels live in process memory, with or without REDIS_URL: a publish only
+reaches streams served by the same worker process. With several workers, a
+stream learns about other workers' writes from its periodic database check in
+game_events, so that poll interval bounds how late those updates can show up.
+"""
+import threading
+import weakref
+
+
+class _Channel:
+    """Condition and version counter shared by the streams watching one game."""
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.version = 0
+    
+    def wait(self, version, timeout):
+        """
+        Block until the version moves past `version` or `timeout` seconds pass.
+        
+        Returns:
+            int: The channel's current version
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+_channels = weakref.WeakValueDictionary()
+_channels_guard = threading.Lock()
+
+
+def subscribe(game_pk):
+    """Channel for a game's updates; it stays registered while the caller keeps a reference."""
+    with _channels_guard:
+        channel = _channels.get(game_pk)
+        if channel is None:
+            channel = _channels[game_pk] = _Channel()
+        return channel
+
+
+def publish(game_pk):
+    """Bump a game's version and wake the streams waiting on it, if any."""
+    channel = _channels.get(game_pk)
+    if channel is None:
+        return
+    with channel.condition:
+        channel.version += 1
+        channel.condition.notify_all()
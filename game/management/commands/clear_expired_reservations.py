@@ -0,0 +1,31 @@
+"""
+Sweep expired color reservations out of all games.
+
+Run from cron, or keep it running with --interval:
+    python manage.py clear_expired_reservations --interval 30
+"""
+import time
+from django.core.management.base import BaseCommand
+from game.models import Game
+
+
+class Command(BaseCommand):
+    help = "Clear expired color reservations across all games."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help="Repeat the sweep every N seconds instead of running once.",
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            cleared = Game.clear_all_expired_reservations()
+            if cleared:
+                self.stdout.write(f"Cleared {cleared} expired reservation(s)")
+            if interval <= 0:
+                break
+            time.sleep(interval)
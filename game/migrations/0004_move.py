@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-15 21:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_move_history(apps, schema_editor):
+    """Copy each game's move_history JSON list into Move rows."""
+    Game = apps.get_model("game", "Game")
+    Move = apps.get_model("game", "Move")
+    for game in Game.objects.exclude(move_history=[]).iterator():
+        history = game.move_history if isinstance(game.move_history, list) else []
+        Move.objects.bulk_create(
+            Move(
+                game=game,
+                ply=ply,
+                from_sq=entry.get("from") or "",
+                to_sq=entry.get("to") or "",
+                promotion=entry.get("promotion"),
+                fen=entry.get("fen") or "",
+                turn=entry.get("turn") or "",
+            )
+            for ply, entry in enumerate(history)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0003_game_color_reservations"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Move",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("ply", models.IntegerField()),
+                ("from_sq", models.CharField(max_length=2)),
+                ("to_sq", models.CharField(max_length=2)),
+                ("promotion", models.CharField(blank=True, max_length=1, null=True)),
+                ("fen", models.TextField()),
+                ("turn", models.CharField(max_length=1)),
+                (
+                    "game",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="moves",
+                        to="game.game",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["ply"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("game", "ply"), name="game_move_game_ply_uniq"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(copy_move_history, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="game",
+            name="move_history",
+        ),
+    ]
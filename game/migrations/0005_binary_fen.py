@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-15 21:45
+
+import struct
+
+import game.models
+from django.db import migrations, models
+
+# Frozen copy of game.chess_utils.pack_fen as of this migration, so later
+# changes to the packing format don't change what it writes
+_PIECE_CODES = {piece: code for code, piece in enumerate("PNBRQKpnbrqk", start=1)}
+_CASTLING_FLAGS = "KQkq"
+_FEN_TAIL = struct.Struct(">BBHH")
+
+
+def pack_fen(fen):
+    """Encode a FEN string as 38 bytes (see game.chess_utils for the layout)."""
+    placement, turn, castling, en_passant, halfmove, fullmove = fen.split()
+    codes = []
+    for char in placement:
+        if char.isdigit():
+            codes.extend([0] * int(char))
+        elif char != "/":
+            codes.append(_PIECE_CODES[char])
+    if len(codes) != 64:
+        raise ValueError(f"Invalid FEN {fen!r}: expected 64 squares, got {len(codes)}")
+    flags = 1 if turn == "b" else 0
+    for bit, right in enumerate(_CASTLING_FLAGS, start=1):
+        if right in castling:
+            flags |= 1 << bit
+    ep_file = 0 if en_passant == "-" else ord(en_passant[0]) - ord("a") + 1
+    board = bytes((codes[i] << 4) | codes[i + 1] for i in range(0, 64, 2))
+    return board + _FEN_TAIL.pack(flags, ep_file, int(halfmove), int(fullmove))
+
+
+def pack_fens(apps, schema_editor):
+    """Fill fen_bin from the text FEN on games and moves."""
+    Game = apps.get_model("game", "Game")
+    Move = apps.get_model("game", "Move")
+    for model in (Game, Move):
+        for obj in model.objects.only("pk", "fen").iterator():
+            model.objects.filter(pk=obj.pk).update(fen_bin=pack_fen(obj.fen))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0004_move"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="fen_bin",
+            field=models.BinaryField(
+                default=game.models.starting_fen_bin, max_length=40
+            ),
+        ),
+        migrations.AddField(
+            model_name="move",
+            name="fen_bin",
+            field=models.BinaryField(default=b"", max_length=40),
+            preserve_default=False,
+        ),
+        migrations.RunPython(pack_fens, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="game",
+            name="fen",
+        ),
+        migrations.RemoveField(
+            model_name="move",
+            name="fen",
+        ),
+    ]
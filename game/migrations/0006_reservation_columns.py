@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-15 22:00
+
+from datetime import datetime, timedelta
+
+from django.db import migrations, models
+
+RESERVATION_TIMEOUT_SECONDS = 180
+
+
+def split_reservations(apps, schema_editor):
+    """Move color_reservations JSON entries into the per-color columns."""
+    Game = apps.get_model("game", "Game")
+    for game in Game.objects.exclude(color_reservations={}).iterator():
+        updates = {}
+        for color in ("white", "black"):
+            reservation = (game.color_reservations or {}).get(color)
+            if not reservation:
+                continue
+            reserved_at = datetime.fromisoformat(
+                reservation["timestamp"].replace("Z", "+00:00")
+            )
+            updates[f"{color}_reservation_session"] = reservation["session_id"]
+            updates[f"{color}_reservation_expires_at"] = reserved_at + timedelta(
+                seconds=RESERVATION_TIMEOUT_SECONDS
+            )
+        if updates:
+            Game.objects.filter(pk=game.pk).update(**updates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0005_binary_fen"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="black_reservation_expires_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="black_reservation_session",
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="white_reservation_expires_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="white_reservation_session",
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.RunPython(split_reservations, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="game",
+            name="color_reservations",
+        ),
+    ]
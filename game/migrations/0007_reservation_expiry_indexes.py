@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-15 22:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0006_reservation_columns"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                condition=models.Q(("white_reservation_expires_at__isnull", False)),
+                fields=["white_reservation_expires_at"],
+                name="game_white_resv_exp_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                condition=models.Q(("black_reservation_expires_at__isnull", False)),
+                fields=["black_reservation_expires_at"],
+                name="game_black_resv_exp_idx",
+            ),
+        ),
+    ]
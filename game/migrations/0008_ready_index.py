@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-15 23:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0007_reservation_expiry_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                condition=models.Q(
+                    ("black_ready", True), ("status", "waiting"), ("white_ready", True)
+                ),
+                fields=["id"],
+                name="game_ready_idx",
+            ),
+        ),
+    ]
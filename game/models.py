@@ -1,15 +1,64 @@
-import random
-import string
+import secrets
 import json
 from datetime import timedelta
+from django.core.cache import cache
 from django.db import models, transaction
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from .chess_utils import get_chess_game_status
+from . import events
+from .cache import invalidate_game
+from .chess_utils import get_chess_game_status, pack_fen, unpack_fen, STARTING_FEN
 
 def generate_game_id():
-    """Generate a random 8-digit game ID."""
-    return ''.join(random.choices(string.digits, k=8))
+    """Generate an unguessable random 8-digit game ID."""
+    return f"{secrets.randbelow(10**8):08d}"
+
+def starting_fen_bin():
+    """Packed starting position, the default for Game.fen_bin."""
+    return pack_fen(STARTING_FEN)
+
+GAME_PK_CACHE_SECONDS = 3600
+
+def _game_pk_cache_key(game_id):
+    return f'gid:{game_id}'
+
+def get_game_pk(game_id):
+    """Primary key for a public game_id through a cached mapping, or None if there is no such game."""
+    key = _game_pk_cache_key(game_id)
+    pk = cache.get(key)
+    if pk is None:
+        pk = Game.objects.filter(game_id=game_id).values_list('pk', flat=True).first()
+        if pk is not None:
+            cache.set(key, pk, GAME_PK_CACHE_SECONDS)
+    return pk
+
+class GameQuerySet(models.QuerySet):
+    # Columns read by game_room and the SSE stream
+    SLIM_FIELDS = (
+        'game_id', 'fen_bin', 'status', 'turn', 'in_check', 'last_move',
+        'player_white', 'player_black', 'white_ready', 'black_ready',
+        'white_reservation_session', 'white_reservation_expires_at',
+        'black_reservation_session', 'black_reservation_expires_at',
+        'spectator_count', 'updated_at',
+    )
+    
+    def slim(self):
+        """Load only SLIM_FIELDS, for read paths; writers keep using full rows."""
+        return self.only(*self.SLIM_FIELDS)
+    
+    def by_game_id(self, game_id):
+        """
+        Filter to the game with this public game_id. The game_id -> pk mapping is
+        cached so hot paths (and row locks) go through the integer primary key.
+        """
+        pk = get_game_pk(game_id)
+        if pk is None:
+            return self.none()
+        return self.filter(pk=pk, game_id=game_id)
+    
+    def ready_to_start(self):
+        """Games with both players ready that are still waiting to start (served by game_ready_idx)."""
+        return self.filter(white_ready=True, black_ready=True, status=Game.STATUS_WAITING)
 
 class Game(models.Model):
     """Model representing a chess game."""
@@ -30,9 +79,16 @@ class Game(models.Model):
         (STATUS_ABANDONED, _('Game abandoned')),
     ]
     
+    # Game status flags mapped to the terminal status they produce, in priority order
+    _TERMINAL_STATUSES = {
+        'in_checkmate': STATUS_CHECKMATE,
+        'in_stalemate': STATUS_STALEMATE,
+        'in_draw': STATUS_DRAW,
+    }
+    
     # Basic game information
     game_id = models.CharField(max_length=8, unique=True, default=generate_game_id)
-    fen = models.TextField(default='rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
+    fen_bin = models.BinaryField(max_length=40, default=starting_fen_bin)  # Packed FEN, see chess_utils.pack_fen
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_WAITING)
     
     # Player information
@@ -44,11 +100,13 @@ class Game(models.Model):
     # Game state
     turn = models.CharField(max_length=1, default='w')  # w or b
     in_check = models.BooleanField(default=False)  # Is king in check
-    move_history = models.JSONField(default=list)  # List of moves in the game
     last_move = models.CharField(max_length=10, blank=True, null=True)  # Last move notation
     
-    # Color reservation system (3-minute timeout)
-    color_reservations = models.JSONField(default=dict)  # {"white": {"session_id": "...", "timestamp": "..."}}
+    # Color reservation system (3-minute timeout); a reservation is live while expires_at is in the future
+    white_reservation_session = models.CharField(max_length=100, null=True, blank=True)
+    white_reservation_expires_at = models.DateTimeField(null=True, blank=True)
+    black_reservation_session = models.CharField(max_length=100, null=True, blank=True)
+    black_reservation_expires_at = models.DateTimeField(null=True, blank=True)
     
     # Spectator information
     spectator_count = models.IntegerField(default=0)
@@ -56,10 +114,57 @@ class Game(models.Model):
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = GameQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Partial index over the (small) set of games waiting to start; the predicate
+            # must be the one ready_to_start() filters on for the planner to use it
+            models.Index(
+                fields=['id'],
+                name='game_ready_idx',
+                condition=models.Q(white_ready=True, black_ready=True, status='waiting'),
+            ),
+            # Partial indexes keep the expired-reservation sweep off a full table scan
+            models.Index(
+                fields=['white_reservation_expires_at'],
+                name='game_white_resv_exp_idx',
+                condition=models.Q(white_reservation_expires_at__isnull=False),
+            ),
+            models.Index(
+                fields=['black_reservation_expires_at'],
+                name='game_black_resv_exp_idx',
+                condition=models.Q(black_reservation_expires_at__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return f"Game {self.game_id}"
     
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding:
+            cache.set(_game_pk_cache_key(self.game_id), self.pk, GAME_PK_CACHE_SECONDS)
+        else:
+            self.notify_changed(self.pk)
+    
+    @staticmethod
+    def notify_changed(pk):
+        """Invalidate the cached game and wake its SSE streams once the current transaction commits."""
+        transaction.on_commit(lambda: invalidate_game(pk))
+        transaction.on_commit(lambda: events.publish(pk))
+    
+    @property
+    def fen(self):
+        """Current position in FEN notation."""
+        return unpack_fen(self.fen_bin)
+    
+    @fen.setter
+    def fen(self, value):
+        self.fen_bin = pack_fen(value)
+    
     @property
     def is_ready_to_start(self):
         """Check if both players are ready to start the game."""
@@ -69,12 +174,12 @@ class Game(models.Model):
         """Start the game if both players are ready."""
         if self.is_ready_to_start:
             self.status = self.STATUS_ACTIVE
-            self.save()
+            self.save(update_fields=['status', 'updated_at'])
             return True
         return False
     
-    def update_status_from_fen(self):
-        """Update game status based on the current FEN."""
+    def update_status_from_fen(self, commit=True):
+        """Update game status based on the current FEN; commit=False leaves saving to the caller."""
         if self.status != self.STATUS_ACTIVE:
             return  # Only update status for active games
         
@@ -86,46 +191,72 @@ class Game(models.Model):
         # Update check status
         self.in_check = status.get('in_check', False)
         
-        # Update game state if game is over
+        # Update game state if game is over (first matching flag wins)
         if status.get('game_over', False):
-            if status.get('in_checkmate', False):
-                self.status = self.STATUS_CHECKMATE
-            elif status.get('in_stalemate', False):
-                self.status = self.STATUS_STALEMATE
-            elif status.get('in_draw', False):
-                self.status = self.STATUS_DRAW
-        
-        self.save()
-    
-    def add_move_to_history(self, move_data, new_fen):
-        """Add a move to the game history."""
-        move_entry = {
-            'from': move_data.get('from'),
-            'to': move_data.get('to'),
-            'promotion': move_data.get('promotion'),
-            'fen': new_fen,
-            'turn': self.turn,
-        }
+            self.status = next(
+                (value for flag, value in self._TERMINAL_STATUSES.items() if status.get(flag)),
+                self.status,
+            )
         
-        # Get move history and append
-        history = self.move_history
-        if not isinstance(history, list):
-            history = []
-        
-        history.append(move_entry)
-        self.move_history = history
+        if commit:
+            self.save(update_fields=['turn', 'in_check', 'status', 'updated_at'])
+    
+    @property
+    def move_history(self):
+        """List of moves in the game, oldest first."""
+        return [
+            {
+                'from': move['from_sq'],
+                'to': move['to_sq'],
+                'promotion': move['promotion'],
+                'fen': unpack_fen(move['fen_bin']),
+                'turn': move['turn'],
+            }
+            for move in self.moves.order_by('ply').values('from_sq', 'to_sq', 'promotion', 'fen_bin', 'turn')
+        ]
+    
+    def add_move_to_history(self, move_data, new_fen, commit=True):
+        """
+        Add a move to the game history (an INSERT, no rewrite of earlier moves).
+        With commit=False the game's last_move is only updated in memory.
+        """
+        Move.objects.create(
+            game=self,
+            ply=self.moves.count(),
+            from_sq=move_data.get('from'),
+            to_sq=move_data.get('to'),
+            promotion=move_data.get('promotion'),
+            fen=new_fen,
+            turn=self.turn,
+        )
         
         # Update last move
         self.last_move = f"{move_data.get('from')}-{move_data.get('to')}"
-        
-        self.save()
+        if commit:
+            self.updated_at = timezone.now()
+            Game.objects.filter(pk=self.pk).update(last_move=self.last_move, updated_at=self.updated_at)
+            self.notify_changed(self.pk)
     
     @classmethod
     def make_move_atomic(cls, game_id, session_id, move_data, validation_func):
-        """Atomically validate and make a move with database locking."""
+        """
+        Atomically validate and make a move with database locking. The move is
+        validated against an unlocked read first, so the chess work happens outside
+        the row lock; it is only revalidated under the lock if the position changed.
+        """
+        fields = ('fen_bin', 'turn', 'status', 'player_white', 'player_black')
+        
+        # Optimistic validation, skipped when the move is bound to be rejected anyway
+        snapshot = cls.objects.only(*fields).by_game_id(game_id).get()
+        result = None
+        if snapshot.status == cls.STATUS_ACTIVE and session_id == (
+                snapshot.player_white if snapshot.turn == 'w' else snapshot.player_black):
+            result = validation_func(snapshot.fen, move_data)
+        
         with transaction.atomic():
-            # Select for update to lock the row
-            game = cls.objects.select_for_update().get(game_id=game_id)
+            # Lock the row with FOR NO KEY UPDATE so inserts referencing the game
+            # (e.g. Move rows) aren't blocked, and load only what validation needs
+            game = cls.objects.select_for_update(no_key=True).only(*fields).by_game_id(game_id).get()
             
             # Check if the player is allowed to make a move
             if (game.turn == 'w' and session_id != game.player_white) or \
@@ -136,8 +267,9 @@ class Game(models.Model):
             if game.status != cls.STATUS_ACTIVE:
                 return {'status': 'error', 'message': 'Game is not active'}
             
-            # Validate the move
-            result = validation_func(game.fen, move_data)
+            # Validate the move, again if the position moved on since the unlocked read
+            if result is None or game.fen_bin != snapshot.fen_bin:
+                result = validation_func(game.fen, move_data)
             
             if not result['valid']:
                 return {
@@ -153,10 +285,22 @@ class Game(models.Model):
             game.turn = 'b' if game.turn == 'w' else 'w'
             
             # Record the move in history
-            game.add_move_to_history(move_data, result['new_fen'])
+            game.add_move_to_history(move_data, result['new_fen'], commit=False)
             
             # Update game status based on move result
-            game.update_status_from_fen()
+            game.update_status_from_fen(commit=False)
+            
+            # Write all game state changes in a single UPDATE while holding the lock
+            game.updated_at = timezone.now()
+            cls.objects.filter(pk=game.pk).update(
+                fen_bin=game.fen_bin,
+                turn=game.turn,
+                in_check=game.in_check,
+                status=game.status,
+                last_move=game.last_move,
+                updated_at=game.updated_at,
+            )
+            cls.notify_changed(game.pk)
             
             return {
                 'status': 'ok',
@@ -169,91 +313,138 @@ class Game(models.Model):
                 }
             }
     
+    @classmethod
+    def inc_spectators(cls, pk):
+        """Atomically add a spectator (a single UPDATE, no read-modify-write)."""
+        updated = cls.objects.filter(pk=pk).update(
+            spectator_count=models.F('spectator_count') + 1, updated_at=timezone.now()
+        )
+        cls.notify_changed(pk)
+        return updated
+    
+    @classmethod
+    def dec_spectators(cls, pk):
+        """Atomically remove a spectator, never going below zero."""
+        updated = cls.objects.filter(pk=pk, spectator_count__gt=0).update(
+            spectator_count=models.F('spectator_count') - 1, updated_at=timezone.now()
+        )
+        if updated:
+            cls.notify_changed(pk)
+        return updated
+    
     # Color reservation management methods
     RESERVATION_TIMEOUT_SECONDS = 180  # 3 minutes
+    COLORS = ('white', 'black')
     
-    def clear_expired_reservations(self):
-        """Remove reservations that have expired (3+ minutes old)."""
-        if not self.color_reservations:
-            return False
-            
-        now = timezone.now()
-        expired_colors = []
-        
-        for color, reservation in self.color_reservations.items():
-            # Parse timestamp string back to datetime
-            reservation_time = timezone.datetime.fromisoformat(reservation['timestamp'].replace('Z', '+00:00'))
-            if (now - reservation_time).total_seconds() > self.RESERVATION_TIMEOUT_SECONDS:
-                expired_colors.append(color)
+    def _active_reservation_session(self, color, now=None):
+        """Session holding an unexpired reservation for a color, or None."""
+        session_id = getattr(self, f'{color}_reservation_session')
+        expires_at = getattr(self, f'{color}_reservation_expires_at')
+        if session_id and expires_at and expires_at > (now or timezone.now()):
+            return session_id
+        return None
+    
+    @classmethod
+    def clear_all_expired_reservations(cls):
+        """
+        Bulk-clear expired reservations across all games (run out-of-band, see the
+        clear_expired_reservations management command). Touched games get a new
+        updated_at and are published, so SSE streams see the freed seats.
         
-        if expired_colors:
-            for color in expired_colors:
-                del self.color_reservations[color]
-            self.save()
-            return True
-        return False
+        Returns:
+            int: Number of reservations cleared
+        """
+        now = timezone.now()
+        cleared = 0
+        with transaction.atomic():
+            for color in cls.COLORS:
+                expired = cls.objects.filter(**{f'{color}_reservation_expires_at__lte': now})
+                pks = list(expired.values_list('pk', flat=True))
+                if not pks:
+                    continue
+                cleared += expired.filter(pk__in=pks).update(**{
+                    f'{color}_reservation_session': None,
+                    f'{color}_reservation_expires_at': None,
+                    'updated_at': now,
+                })
+                for pk in pks:
+                    cls.notify_changed(pk)
+        return cleared
     
     def has_two_ready_players(self):
         """Check if both player slots are filled with ready players."""
         return bool(self.player_white and self.player_black)
     
-    def get_available_colors(self):
-        """Get list of colors available for reservation."""
-        self.clear_expired_reservations()
-        
-        available = []
-        
-        # Check white
-        if not self.player_white and 'white' not in self.color_reservations:
-            available.append('white')
-        
-        # Check black  
-        if not self.player_black and 'black' not in self.color_reservations:
-            available.append('black')
-            
-        return available
+    def get_available_colors(self, reservations=None):
+        """
+        Get list of colors available for reservation, i.e. neither taken nor reserved.
+        Pass the game's get_reservation_summary() to reuse one already built.
+        """
+        reservations = reservations or self.get_reservation_summary()
+        return [
+            color for color in self.COLORS
+            if not getattr(self, f'player_{color}') and not reservations[color]['reserved']
+        ]
     
     def get_reserved_color(self, session_id):
         """Get the color reserved by a specific session."""
-        for color, reservation in self.color_reservations.items():
-            if reservation['session_id'] == session_id:
+        now = timezone.now()
+        for color in self.COLORS:
+            if self._active_reservation_session(color, now) == session_id:
                 return color
         return None
     
     def reserve_color(self, session_id, color):
         """Reserve a color for a session (atomic operation)."""
-        if color not in ['white', 'black']:
+        if color not in self.COLORS:
             return False, "Invalid color"
             
-        # Clear expired reservations first
-        self.clear_expired_reservations()
-        
-        # Check if color is available
-        if color in self.color_reservations:
-            return False, "Color already reserved"
-            
         if (color == 'white' and self.player_white) or (color == 'black' and self.player_black):
             return False, "Color already taken by ready player"
         
+        # Claim the color only if it is unreserved or its reservation has expired
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=self.RESERVATION_TIMEOUT_SECONDS)
+        free = (models.Q(**{f'{color}_reservation_session__isnull': True}) |
+                models.Q(**{f'{color}_reservation_expires_at__lte': now}))
+        claimed = Game.objects.filter(free, pk=self.pk, **{f'player_{color}__isnull': True}).update(**{
+            f'{color}_reservation_session': session_id,
+            f'{color}_reservation_expires_at': expires_at,
+            'updated_at': now,
+        })
+        if not claimed:
+            return False, "Color already reserved"
+        self.notify_changed(self.pk)
+        setattr(self, f'{color}_reservation_session', session_id)
+        setattr(self, f'{color}_reservation_expires_at', expires_at)
+        self.updated_at = now
+        
         # Clear any existing reservation by this session
-        for existing_color in list(self.color_reservations.keys()):
-            if self.color_reservations[existing_color]['session_id'] == session_id:
-                del self.color_reservations[existing_color]
+        other = 'black' if color == 'white' else 'white'
+        if getattr(self, f'{other}_reservation_session') == session_id:
+            Game.objects.filter(pk=self.pk, **{f'{other}_reservation_session': session_id}).update(**{
+                f'{other}_reservation_session': None,
+                f'{other}_reservation_expires_at': None,
+            })
+            setattr(self, f'{other}_reservation_session', None)
+            setattr(self, f'{other}_reservation_expires_at', None)
         
-        # Make new reservation
-        self.color_reservations[color] = {
-            'session_id': session_id,
-            'timestamp': timezone.now().isoformat()
-        }
-        self.save()
         return True, "Color reserved"
     
     def cancel_reservation(self, session_id):
         """Cancel a color reservation by session."""
-        for color in list(self.color_reservations.keys()):
-            if self.color_reservations[color]['session_id'] == session_id:
-                del self.color_reservations[color]
-                self.save()
+        for color in self.COLORS:
+            now = timezone.now()
+            cancelled = Game.objects.filter(pk=self.pk, **{f'{color}_reservation_session': session_id}).update(**{
+                f'{color}_reservation_session': None,
+                f'{color}_reservation_expires_at': None,
+                'updated_at': now,
+            })
+            if cancelled:
+                self.notify_changed(self.pk)
+                setattr(self, f'{color}_reservation_session', None)
+                setattr(self, f'{color}_reservation_expires_at', None)
+                self.updated_at = now
                 return True
         return False
     
@@ -263,32 +454,79 @@ class Game(models.Model):
         if not reserved_color:
             return False, "No reservation found"
         
-        # Assign player
-        if reserved_color == 'white':
-            if self.player_white:
-                return False, "White position already taken"
-            self.player_white = session_id
-            self.white_ready = True
-        else:  # black
-            if self.player_black:
-                return False, "Black position already taken"
-            self.player_black = session_id
-            self.black_ready = True
+        if reserved_color == 'white' and self.player_white:
+            return False, "White position already taken"
+        if reserved_color == 'black' and self.player_black:
+            return False, "Black position already taken"
         
-        # Clear the reservation
-        del self.color_reservations[reserved_color]
-        self.save()
+        # Check and swap in one UPDATE: it only matches while the seat is empty and
+        # this session still holds an unexpired reservation, so no row lock is needed
+        now = timezone.now()
+        changes = {
+            f'player_{reserved_color}': session_id,
+            f'{reserved_color}_ready': True,
+            f'{reserved_color}_reservation_session': None,
+            f'{reserved_color}_reservation_expires_at': None,
+            'updated_at': now,
+        }
+        converted = Game.objects.filter(pk=self.pk, **{
+            f'player_{reserved_color}__isnull': True,
+            f'{reserved_color}_reservation_session': session_id,
+            f'{reserved_color}_reservation_expires_at__gt': now,
+        }).update(**changes)
+        if not converted:
+            return False, "No reservation found"
+        self.notify_changed(self.pk)
+        for field, value in changes.items():
+            setattr(self, field, value)
         
         return True, f"Assigned as {reserved_color} player"
     
+    def get_reservation_summary(self, now=None):
+        """Reserved flag and seconds remaining for each color, checking each reservation once."""
+        now = now or timezone.now()
+        summary = {}
+        for color in self.COLORS:
+            if self._active_reservation_session(color, now):
+                remaining = (getattr(self, f'{color}_reservation_expires_at') - now).total_seconds()
+                summary[color] = {'reserved': True, 'expires_in': int(max(0, remaining))}
+            else:
+                summary[color] = {'reserved': False, 'expires_in': 0}
+        return summary
+    
     def get_reservation_expires_in(self, color):
         """Get seconds remaining for a color reservation."""
-        if color not in self.color_reservations:
+        now = timezone.now()
+        if not self._active_reservation_session(color, now):
             return 0
-            
-        reservation_time = timezone.datetime.fromisoformat(
-            self.color_reservations[color]['timestamp'].replace('Z', '+00:00')
-        )
-        elapsed = (timezone.now() - reservation_time).total_seconds()
-        remaining = max(0, self.RESERVATION_TIMEOUT_SECONDS - elapsed)
-        return int(remaining)
\ No newline at end of file
+        remaining = (getattr(self, f'{color}_reservation_expires_at') - now).total_seconds()
+        return int(max(0, remaining))
+
+
+class Move(models.Model):
+    """A single half-move (ply) in a game's history."""
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='moves')
+    ply = models.IntegerField()  # 0-based half-move number
+    from_sq = models.CharField(max_length=2)
+    to_sq = models.CharField(max_length=2)
+    promotion = models.CharField(max_length=1, blank=True, null=True)
+    fen_bin = models.BinaryField(max_length=40)  # Packed position after the move
+    turn = models.CharField(max_length=1)  # Side to move after the move
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['game', 'ply'], name='game_move_game_ply_uniq'),
+        ]
+        ordering = ['ply']
+    
+    def __str__(self):
+        return f"{self.from_sq}-{self.to_sq} (ply {self.ply})"
+    
+    @property
+    def fen(self):
+        """Position after the move in FEN notation."""
+        return unpack_fen(self.fen_bin)
+    
+    @fen.setter
+    def fen(self, value):
+        self.fen_bin = pack_fen(value)
@@ -4,8 +4,9 @@ Test suite for Family Chess game functionality.
 import json
 from django.test import TestCase, Client
 from django.urls import reverse
-from .models import Game
-from .chess_engine import validate_move, get_game_status
+from . import events
+from .models import Game, GameQuerySet
+from .chess_engine import validate_move, validate_moves, validate_many, get_game_status
 
 
 class ChessEngineTestCase(TestCase):
@@ -27,6 +28,84 @@ class ChessEngineTestCase(TestCase):
         self.assertFalse(result['valid'])
         self.assertIn('reason', result)
         
+    def test_repeated_validation_is_consistent(self):
+        """Test cached validation returns independent, identical results."""
+        starting_fen = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+        first = validate_move(starting_fen, 'g1', 'f3')
+        first['move_info']['captured'] = 'q'
+        second = validate_move(starting_fen, 'g1', 'f3')
+        
+        self.assertTrue(second['valid'])
+        self.assertEqual(first['new_fen'], second['new_fen'])
+        self.assertIsNone(second['move_info']['captured'])
+        
+    def test_promotion_defaults_to_queen(self):
+        """Test a pawn reaching the last rank without a promotion piece becomes a queen."""
+        fen = '8/4P3/8/8/8/8/8/k6K w - - 0 1'
+        result = validate_move(fen, 'e7', 'e8')
+        
+        self.assertTrue(result['valid'])
+        self.assertTrue(result['new_fen'].startswith('4Q3/'))
+        self.assertTrue(result['move_info']['promotion'])
+        
+    def test_batch_validation(self):
+        """Test batch validation matches single-move validation."""
+        starting_fen = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+        moves = [('e2', 'e4', None), ('e2', 'e5', None), ('g1', 'f3', None)]
+        results = validate_moves(starting_fen, moves)
+        
+        self.assertEqual([r['valid'] for r in results], [True, False, True])
+        for (from_sq, to_sq, promotion), result in zip(moves, results):
+            self.assertEqual(result, validate_move(starting_fen, from_sq, to_sq, promotion))
+        
+    def test_batch_validation_rejects_malformed_items(self):
+        """Test malformed batch items get error results, matching single-move validation."""
+        starting_fen = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+        moves = [('e7', 'e8', 5), (None, 'e4', None), ('e2', 'e4', 'x'), ('e2', 'e4', None)]
+        results = validate_moves(starting_fen, moves)
+        
+        self.assertEqual([r['valid'] for r in results], [False, False, False, True])
+        for (from_sq, to_sq, promotion), result in zip(moves, results):
+            self.assertEqual(result, validate_move(starting_fen, from_sq, to_sq, promotion))
+        self.assertTrue(all(r['reason'] == 'Invalid FEN' for r in validate_moves('not a fen', moves)))
+        
+    def test_batch_validation_reasons_match(self):
+        """Test batch and single-move validation give the same reason for bad squares."""
+        starting_fen = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+        moves = [('E2', 'E4', None), ('e2', 'e2', None), ('e9', 'e4', None), ('e2', 'e44', None)]
+        results = validate_moves(starting_fen, moves)
+        
+        for (from_sq, to_sq, promotion), result in zip(moves, results):
+            self.assertFalse(result['valid'])
+            self.assertTrue(result['reason'].startswith('Invalid square notation'))
+            self.assertEqual(result['reason'], validate_move(starting_fen, from_sq, to_sq, promotion)['reason'])
+        
+    def test_new_fen_matches_python_chess(self):
+        """Test patched FENs match a full python-chess serialization."""
+        import chess
+        board = chess.Board()
+        for uci in ['e2e4', 'e7e5', 'g1f3', 'b8c6', 'f1c4', 'g8f6', 'f3g5', 'd7d5', 'e4d5', 'f6d5', 'g5f7', 'e8f7', 'd1f3']:
+            result = validate_move(board.fen(), uci[:2], uci[2:])
+            board.push_uci(uci)
+            self.assertTrue(result['valid'])
+            self.assertEqual(result['new_fen'], board.fen())
+        
+    def test_parallel_validation(self):
+        """Test pooled validation returns results in input order."""
+        starting_fen = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+        items = [(starting_fen, 'e2', 'e4', None), (starting_fen, 'e2', 'e5', None)] * 2
+        results = validate_many(items, max_workers=2)
+        
+        self.assertEqual([r['valid'] for r in results], [True, False, True, False])
+        
+    def test_malformed_fen_rejected(self):
+        """Test malformed FENs are rejected without raising."""
+        for fen in ['', 'not a fen', "8/8/8/8/8/8/8/8 w - - 0 1'); alert(1); ('"]:
+            result = validate_move(fen, 'e2', 'e4')
+            self.assertFalse(result['valid'])
+            self.assertEqual(result['reason'], 'Invalid FEN')
+            self.assertFalse(get_game_status(fen)['game_over'])
+        
     def test_game_status_starting_position(self):
         """Test game status for starting position."""
         starting_fen = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
@@ -38,12 +117,109 @@ class ChessEngineTestCase(TestCase):
         self.assertEqual(status['turn'], 'w')
 
 
+class BinaryFenTestCase(TestCase):
+    """Test the packed FEN encoding."""
+
+    def test_round_trip(self):
+        """Test FENs survive packing and unpacking unchanged."""
+        from .chess_utils import pack_fen, unpack_fen
+        for fen in [
+            'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+            'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3',
+            '8/4P3/8/8/8/8/8/k6K b - - 42 117',
+        ]:
+            packed = pack_fen(fen)
+            self.assertEqual(len(packed), 38)
+            self.assertEqual(unpack_fen(packed), fen)
+
+    def test_invalid_fen(self):
+        """Test malformed FENs raise ValueError."""
+        from .chess_utils import pack_fen
+        with self.assertRaises(ValueError):
+            pack_fen('not a fen')
+
+
+class EventsTestCase(TestCase):
+    """Test in-process game update notifications."""
+
+    def test_publish_wakes_waiter(self):
+        """Test a waiting stream wakes up when an update is published."""
+        import threading
+        
+        channel = events.subscribe('EVENTS01')
+        version = channel.version
+        threading.Timer(0.05, events.publish, ['EVENTS01']).start()
+        self.assertEqual(channel.wait(version, 5), version + 1)
+
+    def test_publish_only_wakes_that_game(self):
+        """Test a publish leaves other games' channels alone and unwatched games untracked."""
+        watched = events.subscribe('EVENTS03')
+        events.publish('EVENTS04')
+        self.assertEqual(watched.version, 0)
+        self.assertNotIn('EVENTS04', events._channels)
+        del watched
+        self.assertNotIn('EVENTS03', events._channels)
+
+    def test_game_writes_publish(self):
+        """Test reservation changes wake SSE streams after commit."""
+        game = Game.objects.create()
+        channel = events.subscribe(game.pk)
+        version = channel.version
+        with self.captureOnCommitCallbacks(execute=True):
+            game.reserve_color('session_1', 'white')
+            game.cancel_reservation('session_1')
+        self.assertEqual(channel.version, version + 2)
+
+    def test_cached_game_invalidated_on_write(self):
+        """Test a committed write retires the cached game snapshot."""
+        from .cache import get_cached_game
+        
+        game = Game.objects.create()
+        self.assertEqual(get_cached_game(game.game_id).spectator_count, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Game.inc_spectators(game.pk)
+        self.assertEqual(get_cached_game(game.game_id).spectator_count, 1)
+        with self.assertRaises(Game.DoesNotExist):
+            get_cached_game('NOSUCH00')
+
+    def test_cached_game_misses_coalesce(self):
+        """Test concurrent cache misses share one database read."""
+        import threading
+        import time
+        from unittest import mock
+        from .cache import get_cached_game, invalidate_game
+        
+        game = Game.objects.create()
+        invalidate_game(game.pk)
+        calls = []
+        
+        def slow_get(**kwargs):
+            calls.append(kwargs)
+            time.sleep(0.05)
+            return game
+        
+        with mock.patch.object(GameQuerySet, 'get', side_effect=slow_get):
+            threads = [threading.Thread(target=get_cached_game, args=[game.game_id]) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(calls), 1)
+
+    def test_wait_times_out(self):
+        """Test waiting returns the unchanged version after the timeout."""
+        channel = events.subscribe('EVENTS02')
+        version = channel.version
+        self.assertEqual(channel.wait(version, 0.01), version)
+
+
 class GameModelTestCase(TestCase):
     """Test the Game model."""
 
-    def setUp(self):
-        """Set up test data."""
-        self.game = Game.objects.create()
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data once for the class; each test sees its own copy."""
+        cls.game = Game.objects.create()
 
     def test_game_creation(self):
         """Test game is created correctly."""
@@ -52,6 +228,11 @@ class GameModelTestCase(TestCase):
         self.assertFalse(self.game.white_ready)
         self.assertFalse(self.game.black_ready)
 
+    def test_lookup_by_game_id(self):
+        """Test games are found by game_id through the cached pk."""
+        self.assertEqual(Game.objects.by_game_id(self.game.game_id).get(), self.game)
+        self.assertFalse(Game.objects.by_game_id('NOSUCH00').exists())
+
     def test_ready_to_start(self):
         """Test ready to start logic."""
         self.assertFalse(self.game.is_ready_to_start)
@@ -64,6 +245,11 @@ class GameModelTestCase(TestCase):
         self.game.save()
         
         self.assertTrue(self.game.is_ready_to_start)
+        self.assertTrue(Game.objects.ready_to_start().filter(pk=self.game.pk).exists())
+
+    def test_ready_to_start_uses_partial_index(self):
+        """Test the ready-to-start query matches the partial index predicate."""
+        self.assertIn('game_ready_idx', Game.objects.ready_to_start().explain())
 
     def test_start_game(self):
         """Test game starting."""
@@ -77,6 +263,88 @@ class GameModelTestCase(TestCase):
         self.assertTrue(result)
         self.assertEqual(self.game.status, Game.STATUS_ACTIVE)
 
+    def test_color_reservation(self):
+        """Test reserving a color blocks other sessions until it expires."""
+        from datetime import timedelta
+        from django.utils import timezone
+        
+        success, _ = self.game.reserve_color('session_1', 'white')
+        self.assertTrue(success)
+        self.assertEqual(self.game.get_reserved_color('session_1'), 'white')
+        self.assertEqual(self.game.get_available_colors(), ['black'])
+        summary = self.game.get_reservation_summary()
+        self.assertTrue(summary['white']['reserved'])
+        self.assertGreater(summary['white']['expires_in'], 0)
+        self.assertEqual(summary['black'], {'reserved': False, 'expires_in': 0})
+        
+        success, message = self.game.reserve_color('session_2', 'white')
+        self.assertFalse(success)
+        self.assertEqual(message, 'Color already reserved')
+        
+        # An expired reservation can be claimed by another session
+        Game.objects.filter(pk=self.game.pk).update(
+            white_reservation_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.get_available_colors(), ['white', 'black'])
+        success, _ = self.game.reserve_color('session_2', 'white')
+        self.assertTrue(success)
+        self.assertEqual(self.game.get_reserved_color('session_2'), 'white')
+
+    def test_convert_reservation_to_player(self):
+        """Test a reservation converts to a seat exactly once."""
+        self.game.reserve_color('session_1', 'white')
+        stale = Game.objects.get(pk=self.game.pk)
+        
+        success, _ = self.game.convert_reservation_to_player('session_1')
+        self.assertTrue(success)
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.player_white, 'session_1')
+        self.assertTrue(self.game.white_ready)
+        self.assertIsNone(self.game.white_reservation_session)
+        
+        # A concurrent writer holding an outdated copy loses the race
+        success, message = stale.convert_reservation_to_player('session_1')
+        self.assertFalse(success)
+        self.assertEqual(message, 'No reservation found')
+
+    def test_clear_all_expired_reservations(self):
+        """Test the out-of-band sweep clears only expired reservations."""
+        from datetime import timedelta
+        from django.utils import timezone
+        
+        self.game.reserve_color('session_1', 'white')
+        other = Game.objects.create(game_id='OTHER1')
+        other.reserve_color('session_2', 'black')
+        Game.objects.filter(pk=self.game.pk).update(
+            white_reservation_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        
+        stale_updated_at = Game.objects.get(pk=self.game.pk).updated_at
+        channel = events.subscribe(self.game.pk)
+        version = channel.version
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(Game.clear_all_expired_reservations(), 1)
+        self.game.refresh_from_db()
+        other.refresh_from_db()
+        self.assertIsNone(self.game.white_reservation_session)
+        self.assertGreater(self.game.updated_at, stale_updated_at)
+        self.assertEqual(channel.version, version + 1)
+        self.assertEqual(other.black_reservation_session, 'session_2')
+
+    def test_spectator_counter(self):
+        """Test spectator counts change atomically and never go negative."""
+        Game.inc_spectators(self.game.pk)
+        Game.inc_spectators(self.game.pk)
+        Game.dec_spectators(self.game.pk)
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.spectator_count, 1)
+        
+        Game.dec_spectators(self.game.pk)
+        Game.dec_spectators(self.game.pk)
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.spectator_count, 0)
+
     def test_move_history(self):
         """Test move history functionality."""
         move_data = {'from': 'e2', 'to': 'e4'}
@@ -85,16 +353,21 @@ class GameModelTestCase(TestCase):
         self.game.add_move_to_history(move_data, new_fen)
         
         self.assertEqual(len(self.game.move_history), 1)
+        self.assertEqual(self.game.moves.get().ply, 0)
         self.assertEqual(self.game.last_move, 'e2-e4')
 
 
 class GameViewsTestCase(TestCase):
     """Test the game views."""
 
+    @classmethod
+    def setUpTestData(cls):
+        """Set up the game once for the class."""
+        cls.game = Game.objects.create()
+
     def setUp(self):
-        """Set up test client and game."""
+        """Set up test client."""
         self.client = Client()
-        self.game = Game.objects.create()
 
     def test_home_view(self):
         """Test home page loads."""
@@ -144,6 +417,79 @@ class GameViewsTestCase(TestCase):
         data = json.loads(response.content)
         self.assertEqual(data['status'], 'ok')
 
+    def test_game_events_stream_closes_cleanly(self):
+        """Test closing the SSE response (client disconnect) stops the stream."""
+        response = self.client.get(reverse('game_events', args=[self.game.game_id]))
+        first = next(iter(response.streaming_content))
+        self.assertEqual(json.loads(first[len(b'data: '):])['fen'], self.game.fen)
+        with self.assertLogs('game.views', 'INFO') as logs:
+            response.close()
+        self.assertIn('Client disconnected', logs.output[-1])
+
+    def test_game_events_counts_spectators(self):
+        """Test a spectator's stream counts them until it closes."""
+        self.game.player_white = 'session_1'
+        self.game.player_black = 'session_2'
+        self.game.save()
+        
+        response = self.client.get(reverse('game_events', args=[self.game.game_id]))
+        first = next(iter(response.streaming_content))
+        self.assertEqual(json.loads(first[len(b'data: '):])['spectators'], 1)
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.spectator_count, 1)
+        
+        response.close()
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.spectator_count, 0)
+
+    def test_slim_game_covers_sse_state(self):
+        """Test the slim queryset loads every column the SSE state reads."""
+        from .views import _build_state
+        
+        game = Game.objects.slim().get(pk=self.game.pk)
+        with self.assertNumQueries(0):
+            _build_state(game, game.get_reservation_summary())
+
+    def test_state_snapshot(self):
+        """Test SSE state snapshots are serialized once per game version."""
+        from unittest import mock
+        from .views import _state_snapshot
+        
+        state, frame = _state_snapshot(self.game)
+        self.assertEqual(state['fen'], self.game.fen)
+        self.assertEqual(json.loads(frame[len(b'data: '):]), state)
+        with mock.patch('game.views._build_state') as build:
+            self.assertEqual(_state_snapshot(self.game), (state, frame))
+        build.assert_not_called()
+
+    def test_moves_page_endpoint(self):
+        """Test the moves endpoint returns only moves after since_ply."""
+        self.game.add_move_to_history({'from': 'e2', 'to': 'e4'}, 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1')
+        self.game.add_move_to_history({'from': 'e7', 'to': 'e5'}, 'rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2')
+        
+        response = self.client.get(reverse('moves_page', args=[self.game.game_id]), {'since_ply': 0})
+        data = json.loads(response.content)
+        self.assertEqual(data['status'], 'ok')
+        self.assertEqual(data['moves'], [{'ply': 1, 'from': 'e7', 'to': 'e5', 'promotion': None}])
+        self.assertFalse(data['has_more'])
+        self.assertIn('stale-while-revalidate=10', response['Cache-Control'])
+        
+        response = self.client.get(reverse('moves_page', args=['NOSUCH00']))
+        self.assertEqual(json.loads(response.content)['status'], 'error')
+        self.assertFalse(response.has_header('Cache-Control'))
+
+    def test_update_status_from_fen(self):
+        """Test terminal positions set the matching game status."""
+        for fen, expected in [
+            ('rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3', Game.STATUS_CHECKMATE),
+            ('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1', Game.STATUS_STALEMATE),
+            ('8/8/8/8/8/5k2/8/5K2 w - - 0 1', Game.STATUS_DRAW),
+        ]:
+            self.game.status = Game.STATUS_ACTIVE
+            self.game.fen = fen
+            self.game.update_status_from_fen(commit=False)
+            self.assertEqual(self.game.status, expected)
+
     def test_make_move_atomic(self):
         """Test atomic move making."""
         from .chess_utils import validate_chess_move
@@ -156,27 +502,67 @@ class GameViewsTestCase(TestCase):
         
         move_data = {'from': 'e2', 'to': 'e4'}
         
-        result = Game.make_move_atomic(
-            game_id=self.game.game_id,
-            session_id='session_1',  # White player
-            move_data=move_data,
-            validation_func=validate_chess_move
-        )
+        channel = events.subscribe(self.game.pk)
+        version = channel.version
+        with self.captureOnCommitCallbacks(execute=True):
+            result = Game.make_move_atomic(
+                game_id=self.game.game_id,
+                session_id='session_1',  # White player
+                move_data=move_data,
+                validation_func=validate_chess_move
+            )
         
         self.assertEqual(result['status'], 'ok')
+        self.assertEqual(channel.version, version + 1)
         
         # Refresh game from database
         self.game.refresh_from_db()
         self.assertEqual(self.game.turn, 'b')  # Turn should switch to black
+        self.assertEqual(self.game.last_move, 'e2-e4')
+        self.assertIn('4P3', self.game.fen)
+        self.assertEqual(len(self.game.move_history), 1)
+
+    def test_make_move_revalidates_after_concurrent_change(self):
+        """Test a move validated against a stale position is revalidated under the lock."""
+        from .chess_utils import pack_fen, validate_chess_move
+        
+        self.game.status = Game.STATUS_ACTIVE
+        self.game.player_white = 'session_1'
+        self.game.player_black = 'session_2'
+        self.game.save()
+        calls = []
+        
+        def validate(fen, move_data):
+            calls.append(fen)
+            if len(calls) == 1:
+                # Another request changes the position while this one validates
+                Game.objects.filter(pk=self.game.pk).update(
+                    fen_bin=pack_fen('rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 1')
+                )
+            return validate_chess_move(fen, move_data)
+        
+        result = Game.make_move_atomic(
+            game_id=self.game.game_id,
+            session_id='session_1',
+            move_data={'from': 'e2', 'to': 'e4'},
+            validation_func=validate
+        )
+        
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(result['status'], 'error')
 
 
 class SecurityTestCase(TestCase):
     """Test security measures."""
 
+    @classmethod
+    def setUpTestData(cls):
+        """Set up the game once for the class."""
+        cls.game = Game.objects.create()
+
     def setUp(self):
-        """Set up test data."""
+        """Set up test client."""
         self.client = Client()
-        self.game = Game.objects.create()
 
     def test_csrf_protection(self):
         """Test CSRF protection is enabled (Django test client auto-handles CSRF)."""
@@ -221,11 +607,15 @@ class SecurityTestCase(TestCase):
 class IntegrationTestCase(TestCase):
     """Integration tests for complete game flow."""
 
+    @classmethod
+    def setUpTestData(cls):
+        """Set up the game once for the class."""
+        cls.game = Game.objects.create()
+
     def setUp(self):
         """Set up test clients for two players."""
         self.client1 = Client()
         self.client2 = Client()
-        self.game = Game.objects.create()
 
     def test_complete_game_setup(self):
         """Test complete game setup flow."""
@@ -7,6 +7,7 @@ urlpatterns = [
     path('<str:game_id>/', views.game_room, name='game_room'),
     path('<str:game_id>/events/', views.game_events, name='game_events'),
     path('<str:game_id>/move/', views.make_move, name='make_move'),
+    path('<str:game_id>/moves/', views.moves_page, name='moves_page'),
     # New reservation system endpoints
     path('<str:game_id>/reserve_color/', views.reserve_color, name='reserve_color'),
     path('<str:game_id>/cancel_reservation/', views.cancel_reservation, name='cancel_reservation'),
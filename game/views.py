@@ -1,29 +1,46 @@
 import json
 import time
 import logging
+import orjson
+from django.core.cache import cache
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.http import HttpResponse, JsonResponse, HttpResponseNotAllowed, StreamingHttpResponse
 from django.utils.translation import gettext as _
+from django.utils.cache import patch_cache_control
 from django.views.decorators.csrf import csrf_exempt
 from django.middleware.csrf import get_token
-from django.db import transaction
-from .models import Game
+from django.db import IntegrityError, transaction
+from . import events
+from .cache import GAME_CACHE_SECONDS, get_cached_game
+from .models import Game, Move, get_game_pk
 from .chess_utils import validate_chess_move, get_chess_game_status
 
 logger = logging.getLogger(__name__)
 
+def orjson_response(data):
+    """JSON response serialized with orjson, for the hot game endpoints."""
+    return HttpResponse(orjson.dumps(data), content_type='application/json')
+
 def home(request):
     """Home page view."""
     return render(request, 'game/home.html')
 
 def create_game(request):
     """Create a new game and redirect to it."""
-    game = Game.objects.create()
+    # Retry on the rare game_id collision instead of pre-checking for it
+    for attempt in range(3):
+        try:
+            with transaction.atomic():
+                game = Game.objects.create()
+            break
+        except IntegrityError:
+            if attempt == 2:
+                raise
     return redirect('game_room', game_id=game.game_id)
 
 def game_room(request, game_id):
     """Game room view with new reservation-based state machine."""
-    game = get_object_or_404(Game, game_id=game_id)
+    game = get_object_or_404(Game.objects.slim().by_game_id(game_id))
     
     # Ensure session exists
     session_id = request.session.session_key
@@ -31,9 +48,6 @@ def game_room(request, game_id):
         request.session.save()
         session_id = request.session.session_key
     
-    # Clear expired reservations
-    game.clear_expired_reservations()
-    
     # Default context
     context = {
         'game': game,
@@ -54,8 +68,7 @@ def game_room(request, game_id):
         context['user_state'] = 'player_ready'
         
     # State 2: Check if user has a color reserved
-    elif game.get_reserved_color(session_id):
-        reserved_color = game.get_reserved_color(session_id)
+    elif reserved_color := game.get_reserved_color(session_id):
         context['color_reserved'] = reserved_color
         context['can_ready'] = True
         context['user_state'] = 'color_reserved'
@@ -80,8 +93,6 @@ def game_room(request, game_id):
     else:
         context['is_spectator'] = True
         context['user_state'] = 'spectator'
-        game.spectator_count += 1
-        game.save()
     
     return render(request, 'game/game_room.html', context)
 
@@ -100,31 +111,31 @@ def reserve_color(request, game_id):
         color = data.get('color')
         
         if color not in ['white', 'black']:
-            return JsonResponse({'status': 'error', 'message': _('Invalid color choice')})
+            return orjson_response({'status': 'error', 'message': _('Invalid color choice')})
         
         # Use atomic operation with database locking
         with transaction.atomic():
-            game = Game.objects.select_for_update().get(game_id=game_id)
+            game = Game.objects.select_for_update().by_game_id(game_id).get()
             success, message = game.reserve_color(session_id, color)
             
             if success:
                 expires_in = game.get_reservation_expires_in(color)
-                return JsonResponse({
+                return orjson_response({
                     'status': 'ok', 
                     'color': color,
                     'expires_in': expires_in,
                     'message': message
                 })
             else:
-                return JsonResponse({'status': 'error', 'message': _(message)})
+                return orjson_response({'status': 'error', 'message': _(message)})
                 
     except Game.DoesNotExist:
-        return JsonResponse({'status': 'error', 'message': _('Game not found')})
+        return orjson_response({'status': 'error', 'message': _('Game not found')})
     except json.JSONDecodeError:
-        return JsonResponse({'status': 'error', 'message': _('Invalid request format')})
+        return orjson_response({'status': 'error', 'message': _('Invalid request format')})
     except Exception as e:
         logger.error(f"Error reserving color: {str(e)}")
-        return JsonResponse({'status': 'error', 'message': _('Server error')})
+        return orjson_response({'status': 'error', 'message': _('Server error')})
 
 def cancel_reservation(request, game_id):
     """Cancel a color reservation."""
@@ -136,7 +147,7 @@ def cancel_reservation(request, game_id):
         return JsonResponse({'status': 'error', 'message': _('Session required')})
     
     try:
-        game = get_object_or_404(Game, game_id=game_id)
+        game = get_cached_game(game_id)
         success = game.cancel_reservation(session_id)
         
         if success:
@@ -144,6 +155,8 @@ def cancel_reservation(request, game_id):
         else:
             return JsonResponse({'status': 'error', 'message': _('No reservation found')})
             
+    except Game.DoesNotExist:
+        return JsonResponse({'status': 'error', 'message': _('Game not found')})
     except Exception as e:
         logger.error(f"Error cancelling reservation: {str(e)}")
         return JsonResponse({'status': 'error', 'message': _('Server error')})
@@ -160,22 +173,22 @@ def player_ready(request, game_id):
         
     session_id = request.session.session_key
     if not session_id:
-        return JsonResponse({'status': 'error', 'message': _('Session required')})
+        return orjson_response({'status': 'error', 'message': _('Session required')})
     
     try:
         # Use atomic operation to prevent race conditions
         with transaction.atomic():
-            game = Game.objects.select_for_update().get(game_id=game_id)
+            game = Game.objects.select_for_update().by_game_id(game_id).get()
             
             # Check if user already is a ready player
             if session_id == game.player_white or session_id == game.player_black:
-                return JsonResponse({'status': 'ok', 'message': _('Already ready'), 'game_started': game.status == 'active'})
+                return orjson_response({'status': 'ok', 'message': _('Already ready'), 'game_started': game.status == 'active'})
             
             # Convert reservation to player assignment
             success, message = game.convert_reservation_to_player(session_id)
             
             if not success:
-                return JsonResponse({'status': 'error', 'message': _(message)})
+                return orjson_response({'status': 'error', 'message': _(message)})
             
             # Check if game can start (both players ready)
             if game.has_two_ready_players() and game.status == Game.STATUS_WAITING:
@@ -183,12 +196,12 @@ def player_ready(request, game_id):
                 # Force updated_at to change to trigger SSE update
                 from django.utils import timezone
                 game.updated_at = timezone.now()
-                game.save()
+                game.save(update_fields=['status', 'updated_at'])
                 game_started = True
             else:
                 game_started = False
             
-            return JsonResponse({
+            return orjson_response({
                 'status': 'ok', 
                 'message': _(message),
                 'game_started': game_started,
@@ -196,90 +209,150 @@ def player_ready(request, game_id):
             })
             
     except Game.DoesNotExist:
-        return JsonResponse({'status': 'error', 'message': _('Game not found')})
+        return orjson_response({'status': 'error', 'message': _('Game not found')})
     except Exception as e:
         logger.error(f"Error in player_ready: {str(e)}")
-        return JsonResponse({'status': 'error', 'message': _('Server error')})
+        return orjson_response({'status': 'error', 'message': _('Server error')})
+
+def _build_state(game, reservations):
+    """Game state as sent to SSE clients, given the game's reservation summary."""
+    # Enhanced game state data with reservation info
+    data = {
+        'fen': game.fen,
+        'status': game.status,
+        'turn': game.turn,
+        'white_ready': game.white_ready,
+        'black_ready': game.black_ready,
+        'spectators': game.spectator_count,
+        'in_check': game.in_check,
+        'last_move': game.last_move,
+        'game_over': game.status not in [Game.STATUS_WAITING, Game.STATUS_ACTIVE],
+        # New reservation system data
+        'available_colors': game.get_available_colors(reservations),
+        'reservations': reservations,
+        'players': {
+            'white_assigned': bool(game.player_white),
+            'black_assigned': bool(game.player_black),
+            'both_ready': game.has_two_ready_players()
+        }
+    }
+
+    # Add game result information if game is over
+    if data['game_over']:
+        if game.status == Game.STATUS_CHECKMATE:
+            # Determine the winner based on who made the last move
+            winner = 'black' if game.turn == 'w' else 'white'
+            data['result'] = f"{winner}_win"
+        elif game.status in [Game.STATUS_STALEMATE, Game.STATUS_DRAW]:
+            data['result'] = 'draw'
+        else:
+            data['result'] = 'abandoned'
+    
+    return data
+
+def _sse_frame(data):
+    return b"data: " + orjson.dumps(data) + b"\n\n"
+
+# SSE frames that never change, built once
+NOT_FOUND_FRAME = _sse_frame({'error': 'Game not found'})
+ERROR_FRAME = _sse_frame({'error': 'Server error'})
+CLOSED_FRAME = _sse_frame({'connection_closed': True})
+HEARTBEAT_FRAME = b": heartbeat\n\n"
+
+def _state_snapshot(game):
+    """
+    A game's current state and its serialized SSE frame. Snapshots are cached per
+    row version (updated_at) and shared by every stream on the game, except while
+    a reservation countdown is running, since expires_in changes every second.
+    """
+    reservations = game.get_reservation_summary()
+    if any(reservation['reserved'] for reservation in reservations.values()):
+        state = _build_state(game, reservations)
+        return state, _sse_frame(state)
+    key = f'game:{game.pk}:sse:{game.updated_at.timestamp()}'
+    snapshot = cache.get(key)
+    if snapshot is None:
+        state = _build_state(game, reservations)
+        snapshot = (state, _sse_frame(state))
+        cache.set(key, snapshot, GAME_CACHE_SECONDS)
+    return snapshot
 
 def game_events(request, game_id):
     """Server-sent events endpoint for real-time game updates."""
+    session_id = request.session.session_key
+    
     def event_stream():
+        disconnected = False
+        spectating = False
         try:
             try:
-                game = Game.objects.get(game_id=game_id)
+                game = get_cached_game(game_id)
             except Game.DoesNotExist:
                 logger.warning(f"SSE connection attempt for non-existent game: {game_id}")
-                yield f"data: {json.dumps({'error': 'Game not found'})}\n\n"
+                yield NOT_FOUND_FRAME
                 return
             last_update = None
+            last_state = None
             error_count = 0
             max_errors = 10
-            max_iterations = 1200  # 10 minutes at 0.5s intervals
+            # Without a published change the row is re-read every poll_interval, to pick
+            # up writes from other processes: quickly while the game is active, backing
+            # off to max_idle_poll once it has been idle for idle_after seconds
+            active_poll_interval = 2
+            max_idle_poll = 5
+            heartbeat_interval = 15
+            idle_after = 30
+            poll_interval = active_poll_interval
+            last_change = last_sent = time.monotonic()
+            deadline = time.monotonic() + 600  # 10 minutes
             iteration_count = 0
+            # A change published before this read is caught by the next heartbeat refresh
+            channel = events.subscribe(game.pk)
+            version = channel.version
             
-            while iteration_count < max_iterations:
+            # Spectators are counted while their stream is open, so the count drops
+            # again when they leave (game_room only decides who is a spectator)
+            if game.has_two_ready_players() and session_id not in (game.player_white, game.player_black):
+                spectating = bool(Game.inc_spectators(game.pk))
+                if spectating:
+                    game.spectator_count += 1
+            
+            while time.monotonic() < deadline:
                 try:
-                    # Check if client disconnected
-                    if hasattr(request, '_stream_disconnected') and request._stream_disconnected:
-                        logger.info(f"Client disconnected from game {game_id}")
-                        break
-                    
                     if game.updated_at != last_update:
-                        # Clear expired reservations before sending state
-                        game.clear_expired_reservations()
-                        
-                        # Enhanced game state data with reservation info
-                        data = {
-                            'fen': game.fen,
-                            'status': game.status,
-                            'turn': game.turn,
-                            'white_ready': game.white_ready,
-                            'black_ready': game.black_ready,
-                            'spectators': game.spectator_count,
-                            'in_check': game.in_check,
-                            'last_move': game.last_move,
-                            'game_over': game.status not in [Game.STATUS_WAITING, Game.STATUS_ACTIVE],
-                            # New reservation system data
-                            'available_colors': game.get_available_colors(),
-                            'reservations': {
-                                'white': {
-                                    'reserved': 'white' in game.color_reservations,
-                                    'expires_in': game.get_reservation_expires_in('white') if 'white' in game.color_reservations else 0
-                                },
-                                'black': {
-                                    'reserved': 'black' in game.color_reservations,
-                                    'expires_in': game.get_reservation_expires_in('black') if 'black' in game.color_reservations else 0
-                                }
-                            },
-                            'players': {
-                                'white_assigned': bool(game.player_white),
-                                'black_assigned': bool(game.player_black),
-                                'both_ready': game.has_two_ready_players()
-                            }
-                        }
-                        
-                        # Add game result information if game is over
-                        if data['game_over']:
-                            if game.status == Game.STATUS_CHECKMATE:
-                                # Determine the winner based on who made the last move
-                                winner = 'black' if game.turn == 'w' else 'white'
-                                data['result'] = f"{winner}_win"
-                            elif game.status in [Game.STATUS_STALEMATE, Game.STATUS_DRAW]:
-                                data['result'] = 'draw'
-                            else:
-                                data['result'] = 'abandoned'
-                        
-                        # Send the game state update
-                        yield f"data: {json.dumps(data)}\n\n"
+                        # Send a full snapshot first, then only the fields that changed
+                        state, frame = _state_snapshot(game)
+                        if last_state is None:
+                            yield frame
+                        else:
+                            changes = {key: value for key, value in state.items() if last_state.get(key) != value}
+                            if changes:
+                                yield _sse_frame({'type': 'delta', 'changes': changes})
+                        last_state = state
                         last_update = game.updated_at
+                        last_change = last_sent = time.monotonic()
+                        poll_interval = active_poll_interval
                         error_count = 0  # Reset error count on successful send
                     
-                    time.sleep(0.5)
+                    # Sleep until a change is published for this game, then re-read the row
+                    new_version = channel.wait(version, poll_interval)
                     iteration_count += 1
-                    
-                    # Refresh game object periodically
-                    if iteration_count % 10 == 0:  # Every 5 seconds
-                        game = Game.objects.get(game_id=game_id)
+                    if new_version == version:
+                        now = time.monotonic()
+                        if now - last_change > idle_after:
+                            poll_interval = min(max_idle_poll, poll_interval * 1.5)
+                        if now - last_sent >= heartbeat_interval:
+                            yield HEARTBEAT_FRAME
+                            last_sent = now
+                        # Nothing published here; check the database directly in case
+                        # another process (with its own cache) changed the game, reading
+                        # the single updated_at column and fetching the row only if it moved
+                        latest = Game.objects.filter(game_id=game_id).values_list('updated_at', flat=True).get()
+                        if latest != last_update:
+                            game = Game.objects.slim().by_game_id(game_id).get()
+                    else:
+                        version = new_version
+                        game = get_cached_game(game_id)
                     
                 except Game.DoesNotExist:
                     logger.info(f"Game {game_id} no longer exists, closing SSE connection")
@@ -292,21 +365,29 @@ def game_events(request, game_id):
                         logger.error(f"Too many errors in SSE stream for game {game_id}, closing connection")
                         break
                     
-                    yield f"data: {json.dumps({'error': 'Server error'})}\n\n"
+                    yield ERROR_FRAME
                     time.sleep(min(5, error_count))  # Exponential backoff
                     
                     try:
-                        game = Game.objects.get(game_id=game_id)
+                        game = Game.objects.slim().by_game_id(game_id).get()
                     except Game.DoesNotExist:
                         break
             
             logger.info(f"SSE connection closed for game {game_id} after {iteration_count} iterations")
             
+        except GeneratorExit:
+            # The server closes the stream at the pending yield once a write to a
+            # disconnected client fails (at the latest on the next heartbeat)
+            disconnected = True
+            logger.info(f"Client disconnected from game {game_id}")
         except Exception as e:
             logger.error(f"Fatal error in SSE stream for game {game_id}: {str(e)}")
         finally:
-            # Send final close message
-            yield f"data: {json.dumps({'connection_closed': True})}\n\n"
+            if spectating:
+                Game.dec_spectators(game.pk)
+            # Send final close message, unless there is no one left to receive it
+            if not disconnected:
+                yield CLOSED_FRAME
     
     response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
     response['Cache-Control'] = 'no-cache'
@@ -314,6 +395,39 @@ def game_events(request, game_id):
     # Note: Connection header removed for Django dev server compatibility
     return response
 
+MOVES_PAGE_SIZE = 100
+
+def moves_page(request, game_id):
+    """Page of a game's moves after ply `since_ply`, for clients keeping a local move list."""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    
+    try:
+        since_ply = int(request.GET.get('since_ply', -1))
+    except ValueError:
+        return orjson_response({'status': 'error', 'message': _('Invalid request format')})
+    
+    game_pk = get_game_pk(game_id)
+    if game_pk is None:
+        return orjson_response({'status': 'error', 'message': _('Game not found')})
+    
+    moves = list(
+        Move.objects.filter(game_id=game_pk, ply__gt=since_ply)
+        .order_by('ply')
+        .values('ply', 'from_sq', 'to_sq', 'promotion')[:MOVES_PAGE_SIZE]
+    )
+    response = orjson_response({
+        'status': 'ok',
+        'moves': [
+            {'ply': m['ply'], 'from': m['from_sq'], 'to': m['to_sq'], 'promotion': m['promotion']}
+            for m in moves
+        ],
+        'has_more': len(moves) == MOVES_PAGE_SIZE,
+    })
+    # Only found games are cacheable; an unknown game_id may be created any moment
+    patch_cache_control(response, max_age=2, stale_while_revalidate=10)
+    return response
+
 def make_move(request, game_id):
     """Process and validate a chess move."""
     if request.method != 'POST':
@@ -343,14 +457,14 @@ def make_move(request, game_id):
         
         if result['status'] == 'error':
             logger.info(f"Invalid move in game {game_id}: {result['message']}")
-            return JsonResponse(result)
+            return orjson_response(result)
         
-        return JsonResponse(result)
+        return orjson_response(result)
         
     except Game.DoesNotExist:
-        return JsonResponse({'status': 'error', 'message': _('Game not found')})
+        return orjson_response({'status': 'error', 'message': _('Game not found')})
     except json.JSONDecodeError:
-        return JsonResponse({'status': 'error', 'message': _('Invalid request format')})
+        return orjson_response({'status': 'error', 'message': _('Invalid request format')})
     except Exception as e:
         logger.error(f"Error processing move: {str(e)}")
-        return JsonResponse({'status': 'error', 'message': _('Server error')})
\ No newline at end of file
+        return orjson_response({'status': 'error', 'message': _('Server error')})
\ No newline at end of file